@@ -1,21 +1,139 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+# gevent has to patch the standard library before anything else imports it
+try:
+    from gevent import monkey
+
+    monkey.patch_all()
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
+
+from flask import Flask, request, jsonify, session
+from flask.json.provider import DefaultJSONProvider
 from flask_jwt_extended import (
     JWTManager,
     jwt_required,
     create_access_token,
     get_jwt_identity,
+    decode_token,
 )
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from werkzeug.exceptions import HTTPException
+from datetime import date, datetime, timedelta
+import atexit
+import click
+import hashlib
+import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
+from utils import hash_password, location_room, restaurant_rooms, ADMIN_ROOM
+
+# Optional Redis support for state shared between workers
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    from cachetools import TTLCache
+    CACHETOOLS_AVAILABLE = True
+except ImportError:
+    CACHETOOLS_AVAILABLE = False
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
 
+
+def configure_logging():
+    """Route all log records through a queue so request handlers never block
+    on writing to stdout; a background listener does the actual output."""
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    listener.start()
+    atexit.register(listener.stop)  # Flush queued records on shutdown
+    return listener
+
+
+log_listener = configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def json_default(o):
+    """Serialize dates as ISO 8601 (as orjson does); defer the rest to Flask"""
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Flask's default provider with ISO 8601 dates instead of HTTP dates.
+
+    Model to_dict() methods return raw datetimes, so both providers must
+    render them the same way.
+    """
+
+    default = staticmethod(json_default)
+
+
+class OrjsonProvider(IsoJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    orjson renders datetimes itself (naive values without an offset, matching
+    isoformat()); Decimal and other unsupported types go through json_default.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # jsonify() goes through here; hand orjson's bytes straight to the
+        # response instead of decoding to str only for Werkzeug to re-encode.
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class OrjsonSocketIOJSON:
+    """json-module lookalike that lets Socket.IO encode packets with orjson"""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj, default=json_default).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app) if ORJSON_AVAILABLE else IsoJSONProvider(app)
 app.url_map.strict_slashes = False  # Prevent 308 redirects for trailing slashes
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "your-secret-key-here")
 
@@ -24,44 +142,143 @@ database_url = os.getenv("DATABASE_URL")
 if not database_url or "mysql" in database_url:
     # Fallback to SQLite for development if MySQL is not available
     database_url = "sqlite:///wireless_ordering.db"
-    print("⚠️  Using SQLite fallback database")
+    logger.warning("⚠️  Using SQLite fallback database")
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+if not database_url.startswith("sqlite"):
+    # Larger pool for concurrent greenlets; pre-ping and recycle so stale
+    # server-side connections are replaced before a request uses them.
+    # SQLite keeps SQLAlchemy's own pool defaults.
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "jwt-secret-string")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=8)
-print("DATABASE_URI:", app.config["SQLALCHEMY_DATABASE_URI"])
-print("SECRET_KEY:", app.config["SECRET_KEY"])
-print("JWT_SECRET_KEY:", app.config["JWT_SECRET_KEY"])
+logger.debug("DATABASE_URI: %s", app.config["SQLALCHEMY_DATABASE_URI"])
+
+# CORS: every /api/* route allows any origin without credentials, so the
+# preflight answer never changes and is served from constant headers.
+CORS_PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+    "Access-Control-Max-Age": "86400",
+}
+
+
+@app.before_request
+def cors_preflight():
+    if request.method == "OPTIONS" and request.path.startswith("/api/"):
+        return app.response_class(status=204, headers=CORS_PREFLIGHT_HEADERS)
+
+
+@app.after_request
+def cors_headers(response):
+    if request.path.startswith("/api/"):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Expose-Headers"] = "Content-Type, Authorization"
+    return response
+
+
+# Compress JSON responses (Brotli when the client accepts it, gzip otherwise)
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_MIN_SIZE"] = 256
+if COMPRESS_AVAILABLE:
+    Compress(app)
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that remembers verified claims for recently seen tokens.
+
+    Clients send the same bearer token on every request, so the signature
+    check is skipped for tokens already verified within the last few minutes.
+    Expiry is still enforced on every hit and the blocklist loader still runs
+    after decoding.
+    """
+
+    def __init__(self, app=None, maxsize=10000, ttl=300):
+        self._decoded_cache = TTLCache(maxsize=maxsize, ttl=ttl) if CACHETOOLS_AVAILABLE else None
+        self._decoded_cache_lock = threading.Lock()
+        super().__init__(app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if self._decoded_cache is None or csrf_value is not None:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = hashlib.blake2b(encoded_token.encode(), digest_size=16).digest()
+        with self._decoded_cache_lock:
+            claims = self._decoded_cache.get(key)
+        if claims is not None and claims.get("exp", float("inf")) > time.time():
+            return claims
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        if claims.get("exp", float("inf")) > time.time():
+            with self._decoded_cache_lock:
+                self._decoded_cache[key] = claims
+        return claims
+
+
+jwt = CachingJWTManager(app)
+
+# Token blocklist for logout functionality. Entries live in Redis keyed by jti
+# and expire together with the token, so every worker sees the same blocklist.
+redis_url = os.getenv("REDIS_URL")
+if REDIS_AVAILABLE and redis_url:
+    redis_pool = redis.ConnectionPool.from_url(
+        redis_url,
+        max_connections=int(os.getenv("REDIS_POOL_SIZE", "10")),
+    )
+    redis_client = redis.Redis(connection_pool=redis_pool)
+else:
+    # Single-process development fallback: jti -> exp timestamp
+    redis_client = None
+    local_blocklist = {}
+    logger.warning("⚠️  Redis not configured, using in-process token blocklist")
+
+# Blueprints reach the shared client through the app rather than importing app
+app.extensions["redis"] = redis_client
+
+
+def revoke_token(jti, exp):
+    """Add a token to the blocklist until it expires"""
+    now = time.time()
+    ttl = max(int(exp - now), 1)
+    if redis_client is not None:
+        redis_client.setex(f"bl:{jti}", ttl, 1)
+    else:
+        # Drop entries whose tokens have expired anyway
+        for expired_jti in [k for k, v in local_blocklist.items() if v <= now]:
+            del local_blocklist[expired_jti]
+        local_blocklist[jti] = exp
+
+
+app.extensions["revoke_token"] = revoke_token
 
-# A more robust CORS configuration for development
-cors = CORS(
-    app,
-    resources={r"/api/*": {"origins": "*"}},
-    allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["Content-Type", "Authorization"],
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    supports_credentials=False,
-)
-jwt = JWTManager(app)
-
-# Token blacklist for logout functionality
-blacklisted_tokens = set()
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     jti = jwt_payload['jti']
-    return jti in blacklisted_tokens
+    if redis_client is not None:
+        return bool(redis_client.exists(f"bl:{jti}"))
+    return jti in local_blocklist
 
 # Socket.IO configuration with better compatibility
+socketio_options = {"json": OrjsonSocketIOJSON} if ORJSON_AVAILABLE else {}
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
-    async_mode="eventlet",
+    async_mode="gevent" if GEVENT_AVAILABLE else "threading",
     logger=False,
     engineio_logger=False,
     ping_timeout=60,
-    ping_interval=25
+    ping_interval=25,
+    http_compression=True,       # Compress long-polling payloads
+    compression_threshold=256,
+    **socketio_options
 )
 
 # Import models and initialize db
@@ -92,82 +309,204 @@ app.register_blueprint(locations_bp, url_prefix="/api/locations")
 app.register_blueprint(admin_bp, url_prefix="/api/admin")
 app.register_blueprint(reservations_bp)
 
+# Auth rate limits share Redis across workers; the moving window is applied
+# atomically by the storage's Lua scripts. Without Redis each process counts
+# on its own.
+from routes.auth import limiter  # noqa: E402
+
+app.config.setdefault("RATELIMIT_STRATEGY", "moving-window")
+if redis_client is not None:
+    app.config.setdefault("RATELIMIT_STORAGE_URI", redis_url)
+    app.config.setdefault("RATELIMIT_STORAGE_OPTIONS", {"connection_pool": redis_pool})
+else:
+    app.config.setdefault("RATELIMIT_STORAGE_URI", "memory://")
+limiter.init_app(app)
+
+# -------------------- Error handling --------------------
+
+
+@app.errorhandler(Exception)
+def handle_unexpected_error(e):
+    """Views let unexpected errors propagate; log them once and answer 500"""
+    if isinstance(e, HTTPException):
+        return e
+    logger.exception(f"Unhandled error on {request.method} {request.path}")
+    db.session.rollback()
+    return jsonify({"error": "Internal server error"}), 500
+
+# -------------------- System configuration cache --------------------
+
+CONFIG_CHANNEL = "system_config"
+
+
+def notify_config_changed(keys):
+    """Drop cached system config in every worker and tell connected clients"""
+    invalidate_system_config_cache()
+    if redis_client is not None:
+        redis_client.publish(CONFIG_CHANNEL, ",".join(keys))
+    socketio.emit("config_update", {"keys": list(keys)})
+
+
+app.extensions["notify_config_changed"] = notify_config_changed
+
+
+def listen_for_config_updates():
+    """Invalidate this worker's config cache when another worker changes it"""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CONFIG_CHANNEL)
+    for _message in pubsub.listen():
+        invalidate_system_config_cache()
+
+
+if redis_client is not None:
+    socketio.start_background_task(listen_for_config_updates)
+
 # -------------------- Socket.IO events --------------------
 
 
 @socketio.on("connect")
 def handle_connect():
-    print("Client connected")
+    logger.debug("Client connected")
 
 
 @socketio.on("disconnect")
 def handle_disconnect():
-    print("Client disconnected")
+    logger.debug("Client disconnected")
 
 
 @socketio.on("join_restaurant")
-def handle_join_restaurant(_data=None):
-    join_room("restaurant")
-    emit("status", {"msg": "Joined restaurant room"})
+def handle_join_restaurant(data=None):
+    # Staff only hear about their own location (location-less staff share
+    # their own room); admins and managers get the global dashboard room.
+    try:
+        claims = decode_token((data or {}).get("token") or "")
+        user = db.session.get(User, int(claims["sub"]))
+    except Exception:
+        user = None
+    if user is None or not user.is_active:
+        emit("status", {"msg": "Authentication required to join restaurant room"})
+        return
+
+    room = ADMIN_ROOM if user.role in ("admin", "manager") else location_room(user.location_id)
+    join_room(room)
+    session["location_id"] = user.location_id
+    emit("status", {"msg": f"Joined {room}"})
 
 
 @socketio.on("new_order")
 def handle_new_order(data):
-    # Broadcast new order to all connected clients
-    socketio.emit("order_update", data, room="restaurant")
+    # Broadcast to the sender's location and the admin dashboard; the
+    # sender already has the order. The location comes from the joined
+    # session only, never from the client payload.
+    if "location_id" not in session:
+        return
+    emit("order_update", data, to=restaurant_rooms(session["location_id"]), include_self=False)
 
 
 @socketio.on("order_status_update")
 def handle_order_status_update(data):
-    # Broadcast order status update
-    socketio.emit("order_status_changed", data, room="restaurant")
+    # Broadcast order status update to everyone else at the location
+    if "location_id" not in session:
+        return
+    emit("order_status_changed", data, to=restaurant_rooms(session["location_id"]), include_self=False)
 
 
 # -------------------- Utility Routes --------------------
 
 
+# Probe endpoints are hit constantly by load balancers, so their bodies are
+# encoded once at import. A fresh Response is still built per request because
+# after_request hooks (CORS, compression) modify it in place.
+INDEX_BODY = app.json.dumps({
+    "message": "Wireless Ordering System API",
+    "version": "1.0.0",
+    "status": "running",
+}).encode()
+
+
 @app.route("/")
 def index():
-    return jsonify({
-        "message": "Wireless Ordering System API",
-        "version": "1.0.0",
-        "status": "running",
-    })
+    return app.response_class(INDEX_BODY, mimetype="application/json")
+
+
+# The health body only changes once a second, so probes arriving within the
+# same second reuse the previously encoded bytes: [generated_at, body].
+_health_cache = [0.0, b""]
+
+
+def _health_body():
+    now = time.time()
+    if now - _health_cache[0] >= 1.0:
+        timestamp = datetime.utcfromtimestamp(now).isoformat().encode()
+        _health_cache[1] = b'{"status":"healthy","timestamp":"' + timestamp + b'"}'
+        _health_cache[0] = now
+    return _health_cache[1]
 
 
 @app.route("/api/health")
 def health_check():
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-    })
+    return app.response_class(_health_body(), mimetype="application/json")
 
 
 # -------------------- App Initialisation --------------------
 
 
-with app.app_context():
+def init_db():
+    """Create tables and the default admin user if they do not exist yet"""
     db.create_all()
 
-    # Create default admin user if not exists
+    # Create the default admin user in one conflict-ignoring INSERT so that
+    # concurrent boots cannot race each other into an IntegrityError
     from models import User  # noqa: E402
 
-    admin = User.query.filter_by(username="admin").first()
-    if not admin:
-        admin_user = User(
-            username="admin",
-            email="admin@restaurant.com",
-            password_hash=generate_password_hash("admin123"),
-            role="admin",
-            first_name="Admin",
-            last_name="User",
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-        print("Default admin user created: admin/admin123")
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(User).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(User).on_conflict_do_nothing()
+    else:
+        from sqlalchemy import insert
+        stmt = insert(User).prefix_with("IGNORE")
+
+    result = db.session.execute(stmt.values(
+        username="admin",
+        email="admin@restaurant.com",
+        password_hash=hash_password("admin123"),
+        role="admin",
+        first_name="Admin",
+        last_name="User",
+    ))
+    db.session.commit()
+    if result.rowcount:
+        logger.info("Default admin user created: admin/admin123")
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Initialise the database (run once per deployment)."""
+    init_db()
+
+
+@app.cli.command("rollup-sales")
+@click.option("--date", "day", type=click.DateTime(formats=["%Y-%m-%d"]),
+              help="Day to aggregate (defaults to yesterday, UTC).")
+def rollup_sales_command(day):
+    """Aggregate completed orders into sales_reports (run nightly)."""
+    from models import SalesReport  # noqa: E402
+
+    day = day.date() if day else datetime.utcnow().date() - timedelta(days=1)
+    rows = SalesReport.rollup(day)
+    logger.info("Sales rollup for %s: %d location rows", day.isoformat(), rows)
 
 
 if __name__ == "__main__":
+    # The development server bootstraps the database itself; deployments
+    # run `flask --app app init-db` once instead of on every worker start.
+    with app.app_context():
+        init_db()
+
     # Optimized for faster startup
     socketio.run(
         app,
@@ -175,5 +514,4 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=5005,
         use_reloader=False,  # Disable auto-reload for faster startup
-        allow_unsafe_werkzeug=True,
     )
\ No newline at end of file
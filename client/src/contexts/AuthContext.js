@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import api from '../config/api';
 import toast from 'react-hot-toast';
+import { joinRestaurant } from '../utils/socket';
 
 const AuthContext = createContext();
 
@@ -58,6 +59,7 @@ export const AuthProvider = ({ children }) => {
       
       // Store token
       localStorage.setItem('token', access_token);
+      joinRestaurant();
       
       // Set user
       setUser(userData);
@@ -9,9 +9,17 @@ export const socket = io(socketUrl, {
   autoConnect: true
 });
 
+// Rooms are per location, so the server needs the JWT to know which to join
+export const joinRestaurant = () => {
+  const token = localStorage.getItem('token');
+  if (token) {
+    socket.emit('join_restaurant', { token });
+  }
+};
+
 socket.on('connect', () => {
   console.log('Connected to server via Socket.IO');
-  socket.emit('join_restaurant');
+  joinRestaurant();
 });
 
 socket.on('connect_error', (error) => {
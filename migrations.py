@@ -4,16 +4,162 @@ Database migration utilities for the Wireless Ordering System
 
 from flask import current_app
 from models import db, User, Order, OrderItem, SystemConfig, AuditLog, RefreshToken
-from sqlalchemy import text, and_
+from sqlalchemy import text, and_, bindparam, func, select
 from datetime import datetime, timedelta
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Encoded once at import rather than on every migration run
+DEFAULT_BUSINESS_HOURS = json.dumps({
+    'monday': {'open': '08:00', 'close': '22:00'},
+    'tuesday': {'open': '08:00', 'close': '22:00'},
+    'wednesday': {'open': '08:00', 'close': '22:00'},
+    'thursday': {'open': '08:00', 'close': '22:00'},
+    'friday': {'open': '08:00', 'close': '23:00'},
+    'saturday': {'open': '09:00', 'close': '23:00'},
+    'sunday': {'open': '09:00', 'close': '21:00'}
+})
+
+# Seed rows for add_system_configs
+DEFAULT_SYSTEM_CONFIGS = [
+    {
+        'key': 'tax_rate',
+        'value': '0.10',
+        'description': 'Default tax rate for orders',
+        'data_type': 'float',
+        'is_public': True
+    },
+    {
+        'key': 'currency',
+        'value': 'EUR',
+        'description': 'Default currency symbol',
+        'data_type': 'string',
+        'is_public': True
+    },
+    {
+        'key': 'order_timeout_minutes',
+        'value': '30',
+        'description': 'Minutes before pending orders are auto-cancelled',
+        'data_type': 'integer',
+        'is_public': False
+    },
+    {
+        'key': 'max_login_attempts',
+        'value': '5',
+        'description': 'Maximum failed login attempts before account lockout',
+        'data_type': 'integer',
+        'is_public': False
+    },
+    {
+        'key': 'lockout_duration_minutes',
+        'value': '30',
+        'description': 'Account lockout duration in minutes',
+        'data_type': 'integer',
+        'is_public': False
+    },
+    {
+        'key': 'enable_audit_logging',
+        'value': 'true',
+        'description': 'Enable audit logging for user actions',
+        'data_type': 'boolean',
+        'is_public': False
+    },
+    {
+        'key': 'business_hours',
+        'value': DEFAULT_BUSINESS_HOURS,
+        'description': 'Business operating hours',
+        'data_type': 'json',
+        'is_public': True
+    }
+]
+
+# Indexes that duplicate a model index (or the leading column of a composite
+# one) and only add write amplification. Older schemas created them via
+# index=True columns and earlier versions of create_indexes.
+REDUNDANT_INDEXES = [
+    ('users', 'ix_users_location_id'),
+    ('users', 'ix_users_role'),
+    ('menu_items', 'ix_menu_items_category_id'),
+    ('table_assignments', 'ix_table_assignments_user_id'),
+    ('table_assignments', 'ix_table_assignments_table_id'),
+    ('tables', 'ix_tables_location_id'),
+    ('menu_items', 'ix_menu_items_price'),
+    ('orders', 'ix_orders_table_id'),
+    ('orders', 'ix_orders_user_id'),
+    ('orders', 'ix_orders_status'),
+    ('orders', 'ix_orders_order_type'),
+    ('order_items', 'ix_order_items_order_id'),
+    ('order_items', 'ix_order_items_menu_item_id'),
+    ('sales_reports', 'ix_sales_reports_date'),
+    ('audit_logs', 'ix_audit_logs_user_id'),
+    ('audit_logs', 'ix_audit_logs_resource_type'),
+    ('audit_logs', 'ix_audit_logs_created_at'),
+    ('refresh_tokens', 'ix_refresh_tokens_user_id'),
+    ('refresh_tokens', 'ix_refresh_tokens_expires_at'),
+    ('reservations', 'ix_reservations_table_id'),
+    ('reservations', 'ix_reservations_status'),
+    ('users', 'idx_users_username'),
+    ('users', 'idx_users_email'),
+    ('users', 'idx_users_role'),
+    ('users', 'idx_users_active'),
+    ('users', 'idx_users_location'),
+    ('users', 'idx_users_created'),
+    ('orders', 'idx_orders_number'),
+    ('orders', 'idx_orders_status'),
+    ('orders', 'idx_orders_type'),
+    ('orders', 'idx_orders_user'),
+    ('orders', 'idx_orders_table'),
+    ('orders', 'idx_orders_created'),
+    ('orders', 'idx_orders_total'),
+    ('order_items', 'idx_order_items_order'),
+    ('order_items', 'idx_order_items_menu'),
+    ('order_items', 'idx_order_items_status'),
+    ('order_items', 'idx_order_items_created'),
+    ('menu_items', 'idx_menu_items_name'),
+    ('menu_items', 'idx_menu_items_category'),
+    ('menu_items', 'idx_menu_items_available'),
+    ('menu_items', 'idx_menu_items_takeaway'),
+    ('menu_items', 'idx_menu_items_price'),
+    ('menu_items', 'idx_menu_items_created'),
+    ('tables', 'idx_tables_number'),
+    ('tables', 'idx_tables_location'),
+    ('tables', 'idx_tables_status'),
+    ('tables', 'idx_tables_active'),
+    ('menu_categories', 'idx_categories_name'),
+    ('menu_categories', 'idx_categories_active'),
+    ('menu_categories', 'idx_categories_sort'),
+    ('menu_categories', 'idx_categories_printer'),
+    ('locations', 'idx_locations_name'),
+    ('locations', 'idx_locations_active'),
+    ('audit_logs', 'idx_audit_logs_user'),
+    ('audit_logs', 'idx_audit_logs_action'),
+    ('audit_logs', 'idx_audit_logs_resource'),
+    ('audit_logs', 'idx_audit_logs_created'),
+    ('refresh_tokens', 'idx_refresh_tokens_user'),
+    ('refresh_tokens', 'idx_refresh_tokens_token'),
+    ('refresh_tokens', 'idx_refresh_tokens_expires'),
+    ('refresh_tokens', 'idx_refresh_tokens_revoked'),
+    ('system_configs', 'idx_system_configs_key'),
+]
+
+# Entries above that only duplicate a partial *_active index off PostgreSQL.
+# On PostgreSQL the partial index skips inactive rows, so these stay as the
+# plain index for foreign key checks and lookups that ignore is_active.
+POSTGRESQL_KEPT_INDEXES = {
+    'ix_users_role',
+    'ix_menu_items_category_id',
+    'ix_table_assignments_user_id',
+    'ix_table_assignments_table_id',
+}
 
 def run_migrations():
     """
     Run database migrations to update schema
     """
     try:
-        print("🔄 Running database migrations...")
+        logger.info("🔄 Running database migrations...")
         
         # Create all tables (this will create new tables and skip existing ones)
         db.create_all()
@@ -23,14 +169,33 @@ def run_migrations():
         add_order_enhancements()
         add_system_configs()
         add_reservations_table()
+        convert_audit_log_values()
+        merge_printer_configs()
+        rebuild_partial_indexes()
         
-        print("✅ Database migrations completed successfully!")
+        logger.info("✅ Database migrations completed successfully!")
         
     except Exception as e:
-        print(f"❌ Migration failed: {str(e)}")
+        logger.error(f"❌ Migration failed: {str(e)}")
         db.session.rollback()
         raise
 
+def execute_ddl(statements):
+    """
+    Run (sql, success_message, failure_message) DDL statements on a single
+    connection and transaction. Each statement runs inside a savepoint so one
+    failure does not abort the remaining statements.
+    """
+    with db.engine.begin() as conn:
+        for sql, success_message, failure_message in statements:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(sql))
+                if success_message:
+                    logger.info(success_message)
+            except Exception as e:
+                logger.warning(f"{failure_message}: {str(e)}")
+
 def add_user_security_columns():
     """
     Add security-related columns to users table
@@ -47,18 +212,18 @@ def add_user_security_columns():
             ('password_changed_at', 'DATETIME DEFAULT CURRENT_TIMESTAMP')
         ]
         
-        for column_name, column_def in columns_to_add:
-            if column_name not in user_columns:
-                try:
-                    with db.engine.connect() as conn:
-                        conn.execute(text(f'ALTER TABLE users ADD COLUMN {column_name} {column_def}'))
-                        conn.commit()
-                    print(f"✅ Added column {column_name} to users table")
-                except Exception as e:
-                    print(f"⚠️  Could not add column {column_name}: {str(e)}")
+        execute_ddl([
+            (
+                f'ALTER TABLE users ADD COLUMN {column_name} {column_def}',
+                f"✅ Added column {column_name} to users table",
+                f"⚠️  Could not add column {column_name}"
+            )
+            for column_name, column_def in columns_to_add
+            if column_name not in user_columns
+        ])
         
     except Exception as e:
-        print(f"⚠️  Error adding user security columns: {str(e)}")
+        logger.warning(f"⚠️  Error adding user security columns: {str(e)}")
 
 def add_order_enhancements():
     """
@@ -77,104 +242,47 @@ def add_order_enhancements():
             ('location_id', 'INTEGER')
         ]
         
-        for column_name, column_def in columns_to_add:
-            if column_name not in order_columns:
-                try:
-                    with db.engine.connect() as conn:
-                        conn.execute(text(f'ALTER TABLE orders ADD COLUMN {column_name} {column_def}'))
-                        conn.commit()
-                    print(f"✅ Added column {column_name} to orders table")
-                except Exception as e:
-                    print(f"⚠️  Could not add column {column_name}: {str(e)}")
+        statements = [
+            (
+                f'ALTER TABLE orders ADD COLUMN {column_name} {column_def}',
+                f"✅ Added column {column_name} to orders table",
+                f"⚠️  Could not add column {column_name}"
+            )
+            for column_name, column_def in columns_to_add
+            if column_name not in order_columns
+        ]
         
         # Make table_id nullable for takeaway orders
-        try:
-            with db.engine.connect() as conn:
-                conn.execute(text('ALTER TABLE orders ALTER COLUMN table_id DROP NOT NULL'))
-                conn.commit()
-            print("✅ Made table_id nullable in orders table")
-        except Exception as e:
-            print(f"⚠️  Could not modify table_id column: {str(e)}")
+        statements.append((
+            'ALTER TABLE orders ALTER COLUMN table_id DROP NOT NULL',
+            "✅ Made table_id nullable in orders table",
+            "⚠️  Could not modify table_id column"
+        ))
+        
+        execute_ddl(statements)
         
     except Exception as e:
-        print(f"⚠️  Error adding order enhancements: {str(e)}")
+        logger.warning(f"⚠️  Error adding order enhancements: {str(e)}")
 
 def add_system_configs():
     """
     Add default system configurations
     """
     try:
-        default_configs = [
-            {
-                'key': 'tax_rate',
-                'value': '0.10',
-                'description': 'Default tax rate for orders',
-                'data_type': 'float',
-                'is_public': True
-            },
-            {
-                'key': 'currency',
-                'value': 'EUR',
-                'description': 'Default currency symbol',
-                'data_type': 'string',
-                'is_public': True
-            },
-            {
-                'key': 'order_timeout_minutes',
-                'value': '30',
-                'description': 'Minutes before pending orders are auto-cancelled',
-                'data_type': 'integer',
-                'is_public': False
-            },
-            {
-                'key': 'max_login_attempts',
-                'value': '5',
-                'description': 'Maximum failed login attempts before account lockout',
-                'data_type': 'integer',
-                'is_public': False
-            },
-            {
-                'key': 'lockout_duration_minutes',
-                'value': '30',
-                'description': 'Account lockout duration in minutes',
-                'data_type': 'integer',
-                'is_public': False
-            },
-            {
-                'key': 'enable_audit_logging',
-                'value': 'true',
-                'description': 'Enable audit logging for user actions',
-                'data_type': 'boolean',
-                'is_public': False
-            },
-            {
-                'key': 'business_hours',
-                'value': json.dumps({
-                    'monday': {'open': '08:00', 'close': '22:00'},
-                    'tuesday': {'open': '08:00', 'close': '22:00'},
-                    'wednesday': {'open': '08:00', 'close': '22:00'},
-                    'thursday': {'open': '08:00', 'close': '22:00'},
-                    'friday': {'open': '08:00', 'close': '23:00'},
-                    'saturday': {'open': '09:00', 'close': '23:00'},
-                    'sunday': {'open': '09:00', 'close': '21:00'}
-                }),
-                'description': 'Business operating hours',
-                'data_type': 'json',
-                'is_public': True
-            }
-        ]
+        keys = [config_data['key'] for config_data in DEFAULT_SYSTEM_CONFIGS]
+        existing = set(db.session.scalars(
+            select(SystemConfig.key).where(SystemConfig.key.in_(keys))
+        ))
         
-        for config_data in default_configs:
-            existing = SystemConfig.query.filter_by(key=config_data['key']).first()
-            if not existing:
-                config = SystemConfig(**config_data)
-                db.session.add(config)
-                print(f"✅ Added system config: {config_data['key']}")
+        for config_data in DEFAULT_SYSTEM_CONFIGS:
+            if config_data['key'] not in existing:
+                db.session.add(SystemConfig(**config_data))
+                logger.info(f"✅ Added system config: {config_data['key']}")
         
         db.session.commit()
         
     except Exception as e:
-        print(f"⚠️  Error adding system configs: {str(e)}")
+        logger.warning(f"⚠️  Error adding system configs: {str(e)}")
         db.session.rollback()
 
 def add_reservations_table():
@@ -206,10 +314,6 @@ def add_reservations_table():
             )
             """
             
-            with db.engine.connect() as conn:
-                conn.execute(text(create_table_sql))
-                conn.commit()
-            
             # Create indexes for reservations table
             reservation_indexes = [
                 'CREATE INDEX idx_reservations_table_date ON reservations(table_id, reservation_date)',
@@ -218,132 +322,238 @@ def add_reservations_table():
                 'CREATE INDEX idx_reservations_created ON reservations(created_at)'
             ]
             
-            for index_sql in reservation_indexes:
-                try:
-                    with db.engine.connect() as conn:
-                        conn.execute(text(index_sql))
-                        conn.commit()
-                except Exception as e:
-                    print(f"⚠️  Could not create reservation index: {str(e)}")
+            with db.engine.begin() as conn:
+                conn.execute(text(create_table_sql))
+                for index_sql in reservation_indexes:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(text(index_sql))
+                    except Exception as e:
+                        logger.warning(f"⚠️  Could not create reservation index: {str(e)}")
             
-            print("✅ Created reservations table with indexes")
+            logger.info("✅ Created reservations table with indexes")
         else:
-            print("✅ Reservations table already exists")
+            logger.info("✅ Reservations table already exists")
         
     except Exception as e:
-        print(f"⚠️  Error creating reservations table: {str(e)}")
+        logger.warning(f"⚠️  Error creating reservations table: {str(e)}")
+
+def convert_audit_log_values():
+    """
+    Convert audit_logs.old_values/new_values from free text to JSON (JSONB on
+    PostgreSQL). Legacy text entries are kept as JSON strings.
+    """
+    try:
+        inspector = db.inspect(db.engine)
+        dialect = db.engine.dialect.name
+        audit_columns = {col['name']: col['type'] for col in inspector.get_columns('audit_logs')}
+        
+        statements = []
+        for column in ('old_values', 'new_values'):
+            if column not in audit_columns:
+                continue
+            if dialect == 'postgresql':
+                if 'JSON' in str(audit_columns[column]).upper():
+                    continue
+                statements.append((
+                    f'ALTER TABLE audit_logs ALTER COLUMN {column} TYPE JSONB USING to_jsonb({column})',
+                    f"✅ Converted audit_logs.{column} to JSONB",
+                    f"⚠️  Could not convert audit_logs.{column}"
+                ))
+            elif dialect == 'mysql':
+                if 'JSON' in str(audit_columns[column]).upper():
+                    continue
+                statements.append((
+                    f'UPDATE audit_logs SET {column} = JSON_QUOTE({column}) WHERE NOT JSON_VALID({column})',
+                    None,
+                    f"⚠️  Could not quote legacy audit_logs.{column} values"
+                ))
+                statements.append((
+                    f'ALTER TABLE audit_logs MODIFY {column} JSON',
+                    f"✅ Converted audit_logs.{column} to JSON",
+                    f"⚠️  Could not convert audit_logs.{column}"
+                ))
+            else:
+                # SQLite stores JSON as text; only legacy values need quoting
+                statements.append((
+                    f'UPDATE audit_logs SET {column} = json_quote({column}) WHERE json_valid({column}) = 0',
+                    None,
+                    f"⚠️  Could not quote legacy audit_logs.{column} values"
+                ))
+        
+        execute_ddl(statements)
+        
+    except Exception as e:
+        logger.warning(f"⚠️  Error converting audit log values: {str(e)}")
+
+def rebuild_partial_indexes():
+    """
+    Recreate model indexes declared with postgresql_where that an older schema
+    created as full indexes (create_all skips indexes that already exist)
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    
+    try:
+        inspector = db.inspect(db.engine)
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                partial = [
+                    index for index in table.indexes
+                    if index.dialect_options['postgresql']['where'] is not None
+                ]
+                if not partial:
+                    continue
+                existing = {
+                    index['name']: index.get('dialect_options', {}).get('postgresql_where')
+                    for index in inspector.get_indexes(table.name)
+                }
+                for index in partial:
+                    if index.name in existing and existing[index.name] is None:
+                        conn.execute(text(f'DROP INDEX {index.name}'))
+                        index.create(conn)
+                        logger.info(f"✅ Rebuilt {index.name} as a partial index")
+    
+    except Exception as e:
+        logger.warning(f"⚠️  Error rebuilding partial indexes: {str(e)}")
+
+def merge_printer_configs():
+    """
+    Move rows from the legacy printer_configs table into printers and drop it.
+    Ids are kept where free so existing references stay valid; rows whose id
+    is already taken are copied with a new id.
+    """
+    try:
+        inspector = db.inspect(db.engine)
+        if 'printer_configs' not in inspector.get_table_names():
+            return
+        
+        columns = 'name, printer_type, ip_address, port, is_active, location_id, created_at'
+        with db.engine.begin() as conn:
+            taken = conn.execute(text(
+                "SELECT id FROM printer_configs WHERE id IN (SELECT id FROM printers)"
+            )).scalars().all()
+            kept = conn.execute(text(
+                f"INSERT INTO printers (id, {columns}) "
+                f"SELECT id, {columns} FROM printer_configs "
+                "WHERE id NOT IN (SELECT id FROM printers)"
+            )).rowcount
+            if db.engine.dialect.name == 'postgresql':
+                conn.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('printers', 'id'), "
+                    "COALESCE(MAX(id), 1)) FROM printers"
+                ))
+            if taken:
+                conn.execute(
+                    text(
+                        f"INSERT INTO printers ({columns}) "
+                        f"SELECT {columns} FROM printer_configs "
+                        "WHERE id IN :ids ORDER BY id"
+                    ).bindparams(bindparam('ids', expanding=True)),
+                    {'ids': taken}
+                )
+            conn.execute(text("DROP TABLE printer_configs"))
+        logger.info(f"✅ Merged {kept + len(taken)} printer_configs rows into printers")
+    
+    except Exception as e:
+        logger.warning(f"⚠️  Error merging printer_configs: {str(e)}")
+
+def drop_redundant_indexes():
+    """
+    Drop indexes listed in REDUNDANT_INDEXES that still exist
+    """
+    try:
+        inspector = db.inspect(db.engine)
+        tables = set(inspector.get_table_names())
+        existing = {
+            (table, index['name'])
+            for table in tables
+            for index in inspector.get_indexes(table)
+        }
+        mysql = db.engine.dialect.name == 'mysql'
+        postgresql = db.engine.dialect.name == 'postgresql'
+        
+        execute_ddl([
+            (
+                f'DROP INDEX {index_name} ON {table}' if mysql else f'DROP INDEX {index_name}',
+                f"✅ Dropped redundant index {index_name}",
+                f"⚠️  Could not drop index {index_name}"
+            )
+            for table, index_name in REDUNDANT_INDEXES
+            if (table, index_name) in existing
+            and not (postgresql and index_name in POSTGRESQL_KEPT_INDEXES)
+        ])
+        
+    except Exception as e:
+        logger.warning(f"⚠️  Error dropping redundant indexes: {str(e)}")
 
 def create_indexes():
     """
     Create database indexes for better performance
     """
     try:
-        print("🔄 Creating database indexes...")
+        logger.info("🔄 Creating database indexes...")
         
+        drop_redundant_indexes()
+        
+        # (table, index name, column) for indexes the models do not declare
         indexes = [
-            # User indexes
-            'CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)',
-            'CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)',
-            'CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)',
-            'CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active)',
-            'CREATE INDEX IF NOT EXISTS idx_users_location ON users(location_id)',
-            'CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at)',
-            
-            # Order indexes
-            'CREATE INDEX IF NOT EXISTS idx_orders_number ON orders(order_number)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_type ON orders(order_type)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_table ON orders(table_id)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_orders_total ON orders(total_amount)',
-            
-            # Order items indexes
-            'CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)',
-            'CREATE INDEX IF NOT EXISTS idx_order_items_menu ON order_items(menu_item_id)',
-            'CREATE INDEX IF NOT EXISTS idx_order_items_status ON order_items(status)',
-            'CREATE INDEX IF NOT EXISTS idx_order_items_created ON order_items(created_at)',
-            
-            # Menu item indexes
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_name ON menu_items(name)',
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_category ON menu_items(category_id)',
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_available ON menu_items(is_available)',
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_takeaway ON menu_items(is_available_takeaway)',
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_price ON menu_items(price)',
-            'CREATE INDEX IF NOT EXISTS idx_menu_items_created ON menu_items(created_at)',
-            
-            # Table indexes
-            'CREATE INDEX IF NOT EXISTS idx_tables_number ON tables(table_number)',
-            'CREATE INDEX IF NOT EXISTS idx_tables_location ON tables(location_id)',
-            'CREATE INDEX IF NOT EXISTS idx_tables_status ON tables(status)',
-            'CREATE INDEX IF NOT EXISTS idx_tables_active ON tables(is_active)',
-            
-            # Category indexes
-            'CREATE INDEX IF NOT EXISTS idx_categories_name ON menu_categories(name)',
-            'CREATE INDEX IF NOT EXISTS idx_categories_active ON menu_categories(is_active)',
-            'CREATE INDEX IF NOT EXISTS idx_categories_sort ON menu_categories(sort_order)',
-            'CREATE INDEX IF NOT EXISTS idx_categories_printer ON menu_categories(printer_destination)',
-            
-            # Location indexes
-            'CREATE INDEX IF NOT EXISTS idx_locations_name ON locations(name)',
-            'CREATE INDEX IF NOT EXISTS idx_locations_active ON locations(is_active)',
-            
-            # Audit log indexes
-            'CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs(user_id)',
-            'CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action)',
-            'CREATE INDEX IF NOT EXISTS idx_audit_logs_resource ON audit_logs(resource_type)',
-            'CREATE INDEX IF NOT EXISTS idx_audit_logs_created ON audit_logs(created_at)',
-            
-            # Refresh token indexes
-            'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens(user_id)',
-            'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_token ON refresh_tokens(token)',
-            'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens(expires_at)',
-            'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_revoked ON refresh_tokens(is_revoked)',
-            
-            # System config indexes
-            'CREATE INDEX IF NOT EXISTS idx_system_configs_key ON system_configs(key)',
-            'CREATE INDEX IF NOT EXISTS idx_system_configs_public ON system_configs(is_public)',
+            ('system_configs', 'idx_system_configs_public', 'is_public'),
         ]
         
-        for index_sql in indexes:
-            try:
-                with db.engine.connect() as conn:
-                    conn.execute(text(index_sql))
-                    conn.commit()
-            except Exception as e:
-                # Index might already exist, which is fine
-                pass
+        # Reflect the indexes that already exist once and only emit DDL for the
+        # missing ones. Plain CREATE INDEX works on every backend, unlike
+        # CREATE INDEX IF NOT EXISTS which MySQL rejects.
+        inspector = db.inspect(db.engine)
+        tables = set(inspector.get_table_names())
+        existing = {
+            (table, index['name'])
+            for table in tables
+            for index in inspector.get_indexes(table)
+        }
+        quote = db.engine.dialect.identifier_preparer.quote
+        
+        missing = [
+            (
+                f'CREATE INDEX {index_name} ON {table}({quote(column)})',
+                f"✅ Created index {index_name}",
+                f"⚠️  Could not create index {index_name}"
+            )
+            for table, index_name, column in indexes
+            if table in tables and (table, index_name) not in existing
+        ]
         
-        print("✅ Database indexes created successfully!")
+        execute_ddl(missing)
+        
+        logger.info(f"✅ Database indexes created successfully! ({len(missing)} new)")
         
     except Exception as e:
-        print(f"⚠️  Error creating indexes: {str(e)}")
+        logger.warning(f"⚠️  Error creating indexes: {str(e)}")
 
 def cleanup_old_data():
     """
     Clean up old data to maintain performance
     """
     try:
-        print("🔄 Cleaning up old data...")
+        logger.info("🔄 Cleaning up old data...")
         
-        # Clean up old audit logs (keep last 6 months)
+        # Clean up old audit logs (keep last 6 months). Each cleanup is a single
+        # DELETE whose row count comes back from the statement itself.
         six_months_ago = datetime.utcnow() - timedelta(days=180)
-        old_logs = AuditLog.query.filter(AuditLog.created_at < six_months_ago).count()
+        old_logs = AuditLog.query.filter(
+            AuditLog.created_at < six_months_ago
+        ).delete(synchronize_session=False)
         
         if old_logs > 0:
-            AuditLog.query.filter(AuditLog.created_at < six_months_ago).delete()
-            print(f"✅ Cleaned up {old_logs} old audit log entries")
+            logger.info(f"✅ Cleaned up {old_logs} old audit log entries")
         
         # Clean up expired refresh tokens
         expired_tokens = RefreshToken.query.filter(
             RefreshToken.expires_at < datetime.utcnow()
-        ).count()
+        ).delete(synchronize_session=False)
         
         if expired_tokens > 0:
-            RefreshToken.query.filter(
-                RefreshToken.expires_at < datetime.utcnow()
-            ).delete()
-            print(f"✅ Cleaned up {expired_tokens} expired refresh tokens")
+            logger.info(f"✅ Cleaned up {expired_tokens} expired refresh tokens")
         
         # Clean up old completed orders (keep last year)
         one_year_ago = datetime.utcnow() - timedelta(days=365)
@@ -355,13 +565,13 @@ def cleanup_old_data():
         ).count()
         
         if old_orders > 0:
-            print(f"⚠️  Found {old_orders} old completed orders (keeping for historical data)")
+            logger.warning(f"⚠️  Found {old_orders} old completed orders (keeping for historical data)")
         
         db.session.commit()
-        print("✅ Data cleanup completed!")
+        logger.info("✅ Data cleanup completed!")
         
     except Exception as e:
-        print(f"⚠️  Error during data cleanup: {str(e)}")
+        logger.warning(f"⚠️  Error during data cleanup: {str(e)}")
         db.session.rollback()
 
 def verify_data_integrity():
@@ -369,40 +579,53 @@ def verify_data_integrity():
     Verify data integrity and fix common issues
     """
     try:
-        print("🔄 Verifying data integrity...")
+        logger.info("🔄 Verifying data integrity...")
         
-        # Check for orders without valid users
-        orphaned_orders = Order.query.filter(
-            ~Order.user_id.in_(db.session.query(User.id))
-        ).count()
+        # Check for orders without valid users (anti-join keeps the FK index usable)
+        orphaned_orders = db.session.query(func.count(Order.id)).outerjoin(
+            User, User.id == Order.user_id
+        ).filter(
+            Order.user_id.isnot(None),
+            User.id.is_(None)
+        ).scalar()
         
         if orphaned_orders > 0:
-            print(f"⚠️  Found {orphaned_orders} orders with invalid user references")
+            logger.warning(f"⚠️  Found {orphaned_orders} orders with invalid user references")
         
         # Check for order items without valid orders
-        orphaned_items = OrderItem.query.filter(
-            ~OrderItem.order_id.in_(db.session.query(Order.id))
-        ).count()
+        orphaned_items = db.session.query(func.count(OrderItem.id)).outerjoin(
+            Order, Order.id == OrderItem.order_id
+        ).filter(
+            Order.id.is_(None)
+        ).scalar()
         
         if orphaned_items > 0:
-            print(f"⚠️  Found {orphaned_items} order items with invalid order references")
-        
-        # Check for inconsistent order totals
-        inconsistent_orders = []
-        orders = Order.query.all()
-        
-        for order in orders:
-            calculated_total = sum(item.total_price for item in order.items)
-            if abs(float(order.total_amount) - float(calculated_total)) > 0.01:
-                inconsistent_orders.append(order.id)
-        
-        if inconsistent_orders:
-            print(f"⚠️  Found {len(inconsistent_orders)} orders with inconsistent totals")
-        
-        print("✅ Data integrity check completed!")
+            logger.warning(f"⚠️  Found {orphaned_items} order items with invalid order references")
+        
+        # Check for inconsistent order totals, letting the database do the summing
+        calculated_total = func.coalesce(func.sum(OrderItem.total_price), 0)
+        inconsistent_orders = db.session.query(
+            Order.order_number, Order.total_amount, calculated_total
+        ).outerjoin(
+            OrderItem, OrderItem.order_id == Order.id
+        ).group_by(
+            Order.id, Order.order_number, Order.total_amount
+        ).having(
+            func.abs(Order.total_amount - calculated_total) > 0.01
+        ).yield_per(1000)
+        
+        inconsistent_count = 0
+        for order_number, total_amount, items_total in inconsistent_orders:
+            inconsistent_count += 1
+            logger.debug(f"   {order_number}: stored {total_amount}, items sum to {items_total}")
+        
+        if inconsistent_count:
+            logger.warning(f"⚠️  Found {inconsistent_count} orders with inconsistent totals")
+        
+        logger.info("✅ Data integrity check completed!")
         
     except Exception as e:
-        print(f"⚠️  Error during data integrity check: {str(e)}")
+        logger.warning(f"⚠️  Error during data integrity check: {str(e)}")
 
 if __name__ == '__main__':
     from app import app
@@ -1,14 +1,86 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Index, event, func
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from utils import hash_password, verify_password, password_needs_rehash, generate_uuid7
+from sqlalchemy import Index, event, func, literal, select
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.hybrid import hybrid_property
+import json
+import os
 import re
-import secrets
+import sqlite3
+import string
 
-db = SQLAlchemy()
+# Instances stay loaded after commit: endpoints serialize what they just wrote
+# without a re-SELECT, and the session is discarded at the end of each request
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
-class User(db.Model):
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys when asked to, per connection; the
+    # routes rely on FK errors the same way on SQLite as on MySQL/PostgreSQL
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+# With SQLALCHEMY_STRICT_LOADING=1 (development/tests) one-to-many collections
+# raise instead of silently lazy loading, so every endpoint has to declare its
+# selectinload/joinedload. Production keeps the normal loader defaults.
+STRICT_LOADING = os.getenv('SQLALCHEMY_STRICT_LOADING', '').lower() in ('1', 'true', 'yes')
+
+def _collection_lazy(default):
+    return 'raise_on_sql' if STRICT_LOADING else default
+
+def _utcnow():
+    """Naive UTC now, matching the timezone-less DateTime columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class Money(TypeDecorator):
+    """
+    NUMERIC(10, 2) loaded as a float. SQLite stores it as REAL and hands back
+    whatever float was written, so results are rounded to the column scale.
+    """
+    impl = db.Numeric(10, 2, asdecimal=False)
+    cache_ok = True
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else round(value, 2)
+
+def _round_money(target, value, oldvalue, initiator):
+    return None if value is None else round(float(value), 2)
+
+@event.listens_for(db.Model, 'mapper_configured', propagate=True)
+def _round_money_on_set(mapper, cls):
+    # Instances stay loaded after commit, so amounts computed in Python are
+    # what the API returns; round them to cents as they are assigned
+    for prop in mapper.column_attrs:
+        if isinstance(prop.columns[0].type, Money):
+            event.listen(prop.class_attribute, 'set', _round_money, retval=True)
+
+def _class_table(chars):
+    """256-byte translate table mapping the given ASCII characters to 1, all else to 0"""
+    table = bytearray(256)
+    for c in chars.encode('ascii'):
+        table[c] = 1
+    return bytes(table)
+
+# Character-class lookups for password checks; bytes.translate runs in C
+_UPPER_TBL = _class_table(string.ascii_uppercase)
+_LOWER_TBL = _class_table(string.ascii_lowercase)
+_DIGIT_TBL = _class_table(string.digits)
+
+class TimestampMixin:
+    """created_at/updated_at columns shared by models that track modification"""
+    created_at = db.Column(db.DateTime, default=_utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=_utcnow, onupdate=_utcnow)
+
+# Validation patterns compiled once at import
+_RE_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+class User(TimestampMixin, db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -17,39 +89,44 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    role = db.Column(db.String(20), nullable=False, default='waiter', index=True)
-    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), index=True)
+    role = db.Column(db.String(20), nullable=False, default='waiter')
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'))
     is_active = db.Column(db.Boolean, default=True, index=True)
     failed_login_attempts = db.Column(db.Integer, default=0)
     locked_until = db.Column(db.DateTime)
     last_login = db.Column(db.DateTime)
-    password_changed_at = db.Column(db.DateTime, default=datetime.utcnow)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    password_changed_at = db.Column(db.DateTime, default=_utcnow)
     
     # Relationship to location
     user_location = db.relationship('Location', backref='users')
     
-    # Database indexes for performance
+    # Database indexes for performance. The *_active indexes are partial on
+    # PostgreSQL: queries filter on is_active, so only live rows are indexed.
+    # Other backends build them as plain indexes, so the plain ix_* index a
+    # foreign key or unfiltered lookup needs is only declared for PostgreSQL.
     __table_args__ = (
-        Index('idx_user_role_active', 'role', 'is_active'),
+        Index('idx_user_role_active', 'role', postgresql_where=db.text('is_active')),
+        Index('ix_users_role', 'role').ddl_if(dialect='postgresql'),
         Index('idx_user_location_role', 'location_id', 'role'),
     )
     
-    @hybrid_property
+    @cached_property
     def full_name(self):
-        return f"{self.first_name} {self.last_name}"
+        # Cached on the instance; dropped by the listeners below when either
+        # name changes or the instance is expired
+        return self.first_name + ' ' + self.last_name
     
     @hybrid_property
     def is_locked(self):
-        return self.locked_until and self.locked_until > datetime.utcnow()
+        locked_until = self.locked_until
+        return locked_until is not None and locked_until > _utcnow()
     
     def set_password(self, password):
         """Set password with validation"""
         if not self.validate_password_strength(password):
             raise ValueError("Password does not meet security requirements")
-        self.password_hash = generate_password_hash(password)
-        self.password_changed_at = datetime.utcnow()
+        self.password_hash = hash_password(password)
+        self.password_changed_at = _utcnow()
         self.failed_login_attempts = 0
         self.locked_until = None
     
@@ -58,15 +135,17 @@ class User(db.Model):
         if self.is_locked:
             return False
         
-        if check_password_hash(self.password_hash, password):
+        if verify_password(self.password_hash, password):
+            if password_needs_rehash(self.password_hash):
+                self.password_hash = hash_password(password)
             self.failed_login_attempts = 0
             self.locked_until = None
-            self.last_login = datetime.utcnow()
+            self.last_login = _utcnow()
             return True
         else:
             self.failed_login_attempts += 1
             if self.failed_login_attempts >= 5:
-                self.locked_until = datetime.utcnow() + timedelta(minutes=30)
+                self.locked_until = _utcnow() + timedelta(minutes=30)
             return False
     
     @staticmethod
@@ -74,19 +153,15 @@ class User(db.Model):
         """Validate password strength"""
         if len(password) < 8:
             return False
-        if not re.search(r'[A-Z]', password):
-            return False
-        if not re.search(r'[a-z]', password):
-            return False
-        if not re.search(r'\d', password):
-            return False
-        return True
+        encoded = password.encode('utf-8', 'ignore')
+        return (b'\x01' in encoded.translate(_UPPER_TBL)
+                and b'\x01' in encoded.translate(_LOWER_TBL)
+                and b'\x01' in encoded.translate(_DIGIT_TBL))
     
     @staticmethod
     def validate_email(email):
         """Validate email format"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return _RE_EMAIL.match(email) is not None
     
     def to_dict(self, include_sensitive=False):
         data = {
@@ -99,21 +174,29 @@ class User(db.Model):
             'role': self.role,
             'location_id': self.location_id,
             'is_active': self.is_active,
-            'last_login': self.last_login.isoformat() if self.last_login else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'last_login': self.last_login,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
         
         if include_sensitive:
             data.update({
                 'failed_login_attempts': self.failed_login_attempts,
                 'is_locked': self.is_locked,
-                'locked_until': self.locked_until.isoformat() if self.locked_until else None,
-                'password_changed_at': self.password_changed_at.isoformat() if self.password_changed_at else None
+                'locked_until': self.locked_until,
+                'password_changed_at': self.password_changed_at
             })
         
         return data
 
+def _reset_full_name(target, *args):
+    target.__dict__.pop('full_name', None)
+
+event.listen(User.first_name, 'set', _reset_full_name)
+event.listen(User.last_name, 'set', _reset_full_name)
+event.listen(User, 'expire', _reset_full_name)
+event.listen(User, 'refresh', _reset_full_name)
+
 class Location(db.Model):
     __tablename__ = 'locations'
     
@@ -123,57 +206,31 @@ class Location(db.Model):
     description = db.Column(db.Text)
     address = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    
-    tables = db.relationship('Table', backref='location', lazy=True)
+    created_at = db.Column(db.DateTime, default=_utcnow, index=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'display_name': self.display_name,
-            'description': self.description,
-            'address': self.address,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    tables = db.relationship('Table', backref='location', lazy=_collection_lazy('select'))
 
 class Table(db.Model):
     __tablename__ = 'tables'
     
     id = db.Column(db.Integer, primary_key=True)
     table_number = db.Column(db.String(10), nullable=False, index=True)
-    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False, index=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
     capacity = db.Column(db.Integer, default=4)
     status = db.Column(db.String(20), default='available', index=True)
     qr_code = db.Column(db.String(255))
     x_position = db.Column(db.Integer, default=0)
     y_position = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=_utcnow)
     
-    orders = db.relationship('Order', backref='table', lazy=True)
+    orders = db.relationship('Order', backref='table', lazy=_collection_lazy('select'))
     
     # Database indexes for performance
     __table_args__ = (
         Index('idx_table_location_status', 'location_id', 'status'),
         Index('idx_table_number_location', 'table_number', 'location_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'table_number': self.table_number,
-            'location_id': self.location_id,
-            'location': self.location.to_dict() if self.location else None,
-            'capacity': self.capacity,
-            'status': self.status,
-            'qr_code': self.qr_code,
-            'x_position': self.x_position,
-            'y_position': self.y_position,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 class Category(db.Model):
     __tablename__ = 'menu_categories'
@@ -185,101 +242,60 @@ class Category(db.Model):
     sort_order = db.Column(db.Integer, default=0, index=True)
     printer_destination = db.Column(db.String(50), default='kitchen', index=True)
     is_active = db.Column(db.Boolean, default=True, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    menu_items = db.relationship('MenuItem', backref='category', lazy=True)
+    created_at = db.Column(db.DateTime, default=_utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'image_url': self.image_url,
-            'sort_order': self.sort_order,
-            'printer_destination': self.printer_destination,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    menu_items = db.relationship('MenuItem', backref=db.backref('category', lazy='selectin'), lazy=_collection_lazy('select'))
 
-class MenuItem(db.Model):
+class MenuItem(TimestampMixin, db.Model):
     __tablename__ = 'menu_items'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
     barcode = db.Column(db.String(50), unique=True, index=True)
-    description = db.Column(db.Text)
-    price = db.Column(db.Numeric(10, 2), nullable=False, index=True)
-    takeaway_price = db.Column(db.Numeric(10, 2))
-    beach_bar_price = db.Column(db.Numeric(10, 2))
-    takeaway_description = db.Column(db.Text)
-    category_id = db.Column(db.Integer, db.ForeignKey('menu_categories.id'), nullable=False, index=True)
-    image_url = db.Column(db.String(255))
+    description = db.deferred(db.Column(db.Text), group='menu_details')
+    price = db.Column(Money, nullable=False)
+    takeaway_price = db.Column(Money)
+    beach_bar_price = db.Column(Money)
+    takeaway_description = db.deferred(db.Column(db.Text), group='menu_details')
+    category_id = db.Column(db.Integer, db.ForeignKey('menu_categories.id'), nullable=False)
+    image_url = db.deferred(db.Column(db.String(255)), group='menu_details')
     is_available = db.Column(db.Boolean, default=True, index=True)
     is_available_takeaway = db.Column(db.Boolean, default=True, index=True)
     is_takeaway_only = db.Column(db.Boolean, default=False, index=True)
     is_active = db.Column(db.Boolean, default=True, index=True)
     preparation_time = db.Column(db.Integer, default=15)
     takeaway_preparation_time = db.Column(db.Integer)
-    allergens = db.Column(db.Text)
-    nutritional_info = db.Column(db.Text)
+    allergens = db.deferred(db.Column(db.Text), group='menu_details')
+    nutritional_info = db.deferred(db.Column(db.Text), group='menu_details')
     sort_order = db.Column(db.Integer, default=0, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Database indexes for performance
     __table_args__ = (
-        Index('idx_menu_category_active', 'category_id', 'is_active'),
+        Index('idx_menu_category_active', 'category_id', postgresql_where=db.text('is_active')),
+        Index('ix_menu_items_category_id', 'category_id').ddl_if(dialect='postgresql'),
         Index('idx_menu_available_takeaway', 'is_available', 'is_available_takeaway'),
         Index('idx_menu_price_range', 'price'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'barcode': self.barcode,
-            'description': self.description,
-            'price': float(self.price),
-            'takeaway_price': float(self.takeaway_price) if self.takeaway_price else None,
-            'beach_bar_price': float(self.beach_bar_price) if self.beach_bar_price else None,
-            'takeaway_description': self.takeaway_description,
-            'category_id': self.category_id,
-            'category': self.category.to_dict() if self.category else None,
-            'image_url': self.image_url,
-            'is_available': self.is_available,
-            'is_available_takeaway': self.is_available_takeaway,
-            'is_takeaway_only': self.is_takeaway_only,
-            'is_active': self.is_active,
-            'preparation_time': self.preparation_time,
-            'takeaway_preparation_time': self.takeaway_preparation_time,
-            'allergens': self.allergens,
-            'nutritional_info': self.nutritional_info,
-            'sort_order': self.sort_order,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
-class Order(db.Model):
+class Order(TimestampMixin, db.Model):
     __tablename__ = 'orders'
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(20), unique=True, nullable=False, index=True)
-    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=True, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
-    status = db.Column(db.String(20), default='pending', index=True)
-    order_type = db.Column(db.String(20), default='dine_in', index=True)
-    subtotal = db.Column(db.Numeric(10, 2), default=0)
-    tax_amount = db.Column(db.Numeric(10, 2), default=0)
-    discount_amount = db.Column(db.Numeric(10, 2), default=0)
-    total_amount = db.Column(db.Numeric(10, 2), default=0, index=True)
+    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    status = db.Column(db.String(20), default='pending')
+    order_type = db.Column(db.String(20), default='dine_in')
+    subtotal = db.Column(Money, default=0)
+    tax_amount = db.Column(Money, default=0)
+    discount_amount = db.Column(Money, default=0)
+    total_amount = db.Column(Money, default=0, index=True)
     notes = db.Column(db.Text)
     customer_name = db.Column(db.String(100))
     estimated_ready_time = db.Column(db.DateTime)
     location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    items = db.relationship('OrderItem', backref='order', lazy=_collection_lazy('selectin'), cascade='all, delete-orphan')
     waiter = db.relationship('User', backref='orders')
     
     # Database indexes for performance
@@ -293,65 +309,27 @@ class Order(db.Model):
     @hybrid_property
     def final_total(self):
         return self.total_amount + self.tax_amount - self.discount_amount
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'order_number': self.order_number,
-            'table_id': self.table_id,
-            'table': self.table.to_dict() if self.table else None,
-            'user_id': self.user_id,
-            'user': self.waiter.to_dict() if self.waiter else None,
-            'status': self.status,
-            'order_type': self.order_type,
-            'subtotal': float(self.subtotal),
-            'tax_amount': float(self.tax_amount),
-            'discount_amount': float(self.discount_amount),
-            'total_amount': float(self.total_amount),
-            'final_total': float(self.final_total),
-            'notes': self.notes,
-            'customer_name': self.customer_name,
-            'estimated_ready_time': self.estimated_ready_time.isoformat() if self.estimated_ready_time else None,
-            'location_id': self.location_id,
-            'items': [item.to_dict() for item in self.items],
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False, index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
-    unit_price = db.Column(db.Numeric(10, 2), nullable=False)
-    total_price = db.Column(db.Numeric(10, 2), nullable=False)
+    unit_price = db.Column(Money, nullable=False)
+    total_price = db.Column(Money, nullable=False)
     special_instructions = db.Column(db.Text)
     status = db.Column(db.String(20), default='pending', index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, default=_utcnow, index=True)
     
-    menu_item = db.relationship('MenuItem', backref='order_items')
+    menu_item = db.relationship('MenuItem', backref='order_items', lazy='selectin')
     
     # Database indexes for performance
     __table_args__ = (
         Index('idx_order_item_status', 'order_id', 'status'),
         Index('idx_order_item_menu', 'menu_item_id', 'created_at'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'order_id': self.order_id,
-            'menu_item_id': self.menu_item_id,
-            'menu_item': self.menu_item.to_dict() if self.menu_item else None,
-            'quantity': self.quantity,
-            'unit_price': float(self.unit_price),
-            'total_price': float(self.total_price),
-            'special_instructions': self.special_instructions,
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 class Printer(db.Model):
     __tablename__ = 'printers'
@@ -363,30 +341,18 @@ class Printer(db.Model):
     port = db.Column(db.Integer, default=9100)
     is_active = db.Column(db.Boolean, default=True, index=True)
     location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'printer_type': self.printer_type,
-            'ip_address': self.ip_address,
-            'port': self.port,
-            'is_active': self.is_active,
-            'location_id': self.location_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    created_at = db.Column(db.DateTime, default=_utcnow)
 
 # Alias for backward compatibility
-MenuCategory = Category
+PrinterConfig = Printer
 
 class TableAssignment(db.Model):
     __tablename__ = 'table_assignments'
     
     id = db.Column(db.Integer, primary_key=True)
-    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=False, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    assigned_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    assigned_at = db.Column(db.DateTime, default=_utcnow, index=True)
     is_active = db.Column(db.Boolean, default=True, index=True)
     
     table = db.relationship('Table', backref='assignments')
@@ -394,71 +360,61 @@ class TableAssignment(db.Model):
     
     # Database indexes for performance
     __table_args__ = (
-        Index('idx_assignment_user_active', 'user_id', 'is_active'),
-        Index('idx_assignment_table_active', 'table_id', 'is_active'),
+        Index('idx_assignment_user_active', 'user_id', postgresql_where=db.text('is_active')),
+        Index('idx_assignment_table_active', 'table_id', postgresql_where=db.text('is_active')),
+        Index('ix_table_assignments_user_id', 'user_id').ddl_if(dialect='postgresql'),
+        Index('ix_table_assignments_table_id', 'table_id').ddl_if(dialect='postgresql'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'table_id': self.table_id,
-            'user_id': self.user_id,
-            'table': self.table.to_dict() if self.table else None,
-            'user': self.user.to_dict() if self.user else None,
-            'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
-            'is_active': self.is_active
-        }
 
 class SalesReport(db.Model):
     __tablename__ = 'sales_reports'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False)
     location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), index=True)
-    total_sales = db.Column(db.Numeric(10, 2), default=0)
+    total_sales = db.Column(Money, default=0)
     total_orders = db.Column(db.Integer, default=0)
-    average_order_value = db.Column(db.Numeric(10, 2), default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    average_order_value = db.Column(Money, default=0)
+    created_at = db.Column(db.DateTime, default=_utcnow)
     
     # Database indexes for performance
     __table_args__ = (
         Index('idx_sales_date_location', 'date', 'location_id'),
     )
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'date': self.date.isoformat() if self.date else None,
-            'location_id': self.location_id,
-            'total_sales': float(self.total_sales),
-            'total_orders': self.total_orders,
-            'average_order_value': float(self.average_order_value),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
-
-class PrinterConfig(db.Model):
-    __tablename__ = 'printer_configs'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    printer_type = db.Column(db.String(20), nullable=False, index=True)
-    ip_address = db.Column(db.String(15))
-    port = db.Column(db.Integer, default=9100)
-    is_active = db.Column(db.Boolean, default=True, index=True)
-    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'printer_type': self.printer_type,
-            'ip_address': self.ip_address,
-            'port': self.port,
-            'is_active': self.is_active,
-            'location_id': self.location_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    @classmethod
+    def rollup(cls, day, location_id=None):
+        """
+        (Re)build the report rows for one day from completed orders with a
+        single INSERT ... SELECT aggregate, replacing rows already stored
+        """
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        
+        existing = db.delete(cls).where(cls.date == day)
+        orders = select(
+            literal(day, db.Date),
+            Order.location_id,
+            func.coalesce(func.sum(Order.total_amount), 0),
+            func.count(Order.id),
+            func.coalesce(func.avg(Order.total_amount), 0),
+            literal(_utcnow(), db.DateTime),
+        ).where(
+            Order.created_at >= start,
+            Order.created_at < end,
+            Order.status.in_(['served', 'ready'])
+        ).group_by(Order.location_id)
+        if location_id is not None:
+            existing = existing.where(cls.location_id == location_id)
+            orders = orders.where(Order.location_id == location_id)
+        
+        db.session.execute(existing)
+        result = db.session.execute(db.insert(cls).from_select(
+            ['date', 'location_id', 'total_sales', 'total_orders', 'average_order_value', 'created_at'],
+            orders
+        ))
+        db.session.commit()
+        return result.rowcount
 
 # New models for enhanced functionality
 
@@ -466,15 +422,15 @@ class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     action = db.Column(db.String(100), nullable=False, index=True)
-    resource_type = db.Column(db.String(50), nullable=False, index=True)
+    resource_type = db.Column(db.String(50), nullable=False)
     resource_id = db.Column(db.Integer, index=True)
-    old_values = db.Column(db.Text)  # JSON string
-    new_values = db.Column(db.Text)  # JSON string
+    old_values = db.deferred(db.Column(db.JSON().with_variant(JSONB, 'postgresql')), group='audit_details')
+    new_values = db.deferred(db.Column(db.JSON().with_variant(JSONB, 'postgresql')), group='audit_details')
     ip_address = db.Column(db.String(45))
-    user_agent = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    user_agent = db.deferred(db.Column(db.Text), group='audit_details')
+    created_at = db.Column(db.DateTime, default=_utcnow)
     
     user = db.relationship('User', backref='audit_logs')
     
@@ -484,31 +440,16 @@ class AuditLog(db.Model):
         Index('idx_audit_resource', 'resource_type', 'resource_id'),
         Index('idx_audit_date_action', 'created_at', 'action'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'user': self.user.to_dict() if self.user else None,
-            'action': self.action,
-            'resource_type': self.resource_type,
-            'resource_id': self.resource_id,
-            'old_values': self.old_values,
-            'new_values': self.new_values,
-            'ip_address': self.ip_address,
-            'user_agent': self.user_agent,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 class RefreshToken(db.Model):
     __tablename__ = 'refresh_tokens'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     token = db.Column(db.String(255), unique=True, nullable=False, index=True)
-    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
     is_revoked = db.Column(db.Boolean, default=False, index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=_utcnow)
     
     user = db.relationship('User', backref='refresh_tokens')
     
@@ -520,35 +461,25 @@ class RefreshToken(db.Model):
     
     @staticmethod
     def generate_token():
-        return secrets.token_urlsafe(32)
+        # Time-ordered so new rows append to the right edge of the unique index
+        return generate_uuid7().hex
     
     def is_expired(self):
-        return datetime.utcnow() > self.expires_at
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'is_revoked': self.is_revoked,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return _utcnow() > self.expires_at
 
-class Reservation(db.Model):
+class Reservation(TimestampMixin, db.Model):
     __tablename__ = 'reservations'
     
     id = db.Column(db.Integer, primary_key=True)
-    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=False, index=True)
+    table_id = db.Column(db.Integer, db.ForeignKey('tables.id'), nullable=False)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20))
     customer_email = db.Column(db.String(120))
     party_size = db.Column(db.Integer, nullable=False)
     reservation_date = db.Column(db.DateTime, nullable=False, index=True)
-    status = db.Column(db.String(20), default='confirmed', index=True)  # confirmed, cancelled, completed, no_show
+    status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled, completed, no_show
     notes = db.Column(db.Text)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     table = db.relationship('Table', backref='reservations')
     creator = db.relationship('User', backref='created_reservations')
@@ -559,26 +490,18 @@ class Reservation(db.Model):
         Index('idx_reservation_status_date', 'status', 'reservation_date'),
         Index('idx_reservation_customer', 'customer_name', 'customer_phone'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'table_id': self.table_id,
-            'table': self.table.to_dict() if self.table else None,
-            'customer_name': self.customer_name,
-            'customer_phone': self.customer_phone,
-            'customer_email': self.customer_email,
-            'party_size': self.party_size,
-            'reservation_date': self.reservation_date.isoformat() if self.reservation_date else None,
-            'status': self.status,
-            'notes': self.notes,
-            'created_by': self.created_by,
-            'creator': self.creator.to_dict() if self.creator else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
-class SystemConfig(db.Model):
+# SystemConfig.data_type -> parser for the stored text, and the value used
+# when nothing is stored
+_CONFIG_PARSERS = {
+    'integer': int,
+    'float': float,
+    'boolean': lambda value: value.lower() in ('true', '1', 'yes'),
+    'json': json.loads,
+}
+_CONFIG_EMPTY_VALUES = {'integer': 0, 'float': 0.0, 'boolean': False, 'json': {}}
+
+class SystemConfig(TimestampMixin, db.Model):
     __tablename__ = 'system_configs'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -587,31 +510,100 @@ class SystemConfig(db.Model):
     description = db.Column(db.Text)
     data_type = db.Column(db.String(20), default='string')  # string, integer, float, boolean, json
     is_public = db.Column(db.Boolean, default=False)  # Can be accessed by non-admin users
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def get_typed_value(self):
         """Return the value converted to the appropriate type"""
-        if self.data_type == 'integer':
-            return int(self.value) if self.value else 0
-        elif self.data_type == 'float':
-            return float(self.value) if self.value else 0.0
-        elif self.data_type == 'boolean':
-            return self.value.lower() in ('true', '1', 'yes') if self.value else False
-        elif self.data_type == 'json':
-            import json
-            return json.loads(self.value) if self.value else {}
+        # Memoized per instance; keyed on (data_type, value) so edits re-parse
+        cached = self.__dict__.get('_typed_value')
+        if cached is not None and cached[0] == self.data_type and cached[1] == self.value:
+            return cached[2]
+        if self.value:
+            typed = _CONFIG_PARSERS.get(self.data_type, str)(self.value)
         else:
-            return self.value
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'key': self.key,
-            'value': self.get_typed_value(),
-            'description': self.description,
-            'data_type': self.data_type,
-            'is_public': self.is_public,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+            typed = _CONFIG_EMPTY_VALUES.get(self.data_type, self.value)
+        self.__dict__['_typed_value'] = (self.data_type, self.value, typed)
+        return typed
+
+def _compile_to_dict(cls, exclude=(), overrides=None, extra=None):
+    """
+    Generate cls.to_dict from the table's columns as a single dict display.
+    overrides replaces a column's expression; extra appends derived or
+    relationship fields after the columns. Deferred columns are only included
+    when to_dict is called with include_deferred=True (the default).
+    """
+    overrides = overrides or {}
+    fields, deferred_fields = [], []
+    for column in cls.__table__.columns:
+        if column.key in exclude:
+            continue
+        field = (column.key, overrides.get(column.key, f'self.{column.key}'))
+        if cls.__mapper__.column_attrs[column.key].deferred:
+            deferred_fields.append(field)
+        else:
+            fields.append(field)
+    fields.extend((extra or {}).items())
+    body = ''.join(f'        {key!r}: {expr},\n' for key, expr in fields)
+    source = f'def to_dict(self, include_deferred=True):\n    data = {{\n{body}    }}\n'
+    if deferred_fields:
+        body = ''.join(f'            {key!r}: {expr},\n' for key, expr in deferred_fields)
+        source += f'    if include_deferred:\n        data.update({{\n{body}        }})\n'
+    source += '    return data\n'
+    namespace = {}
+    exec(compile(source, f'<{cls.__name__}.to_dict>', 'exec'), namespace)
+    cls.to_dict = namespace['to_dict']
+
+_compile_to_dict(Location)
+_compile_to_dict(Table, extra={'location': 'self.location.to_dict() if self.location else None'})
+_compile_to_dict(Category)
+_compile_to_dict(
+    MenuItem,
+    overrides={
+        'takeaway_price': 'self.takeaway_price or None',
+        'beach_bar_price': 'self.beach_bar_price or None',
+    },
+    extra={'category': 'self.category.to_dict() if self.category else None'}
+)
+_compile_to_dict(Order, extra={
+    'table': 'self.table.to_dict() if self.table else None',
+    'user': 'self.waiter.to_dict() if self.waiter else None',
+    'final_total': 'round(self.final_total, 2)',
+    'items': '[item.to_dict() for item in self.items]',
+})
+_compile_to_dict(OrderItem, extra={
+    'menu_item': 'self.menu_item.to_dict(include_deferred=False) if self.menu_item else None',
+})
+_compile_to_dict(Printer)
+_compile_to_dict(TableAssignment, extra={
+    'table': 'self.table.to_dict() if self.table else None',
+    'user': 'self.user.to_dict() if self.user else None',
+})
+_compile_to_dict(SalesReport)
+_compile_to_dict(AuditLog, extra={'user': 'self.user.to_dict() if self.user else None'})
+_compile_to_dict(RefreshToken, exclude=('token',))
+_compile_to_dict(Reservation, extra={
+    'table': 'self.table.to_dict() if self.table else None',
+    'creator': 'self.creator.to_dict() if self.creator else None',
+})
+_compile_to_dict(SystemConfig, overrides={'value': 'self.get_typed_value()'})
+
+# In-process cache of typed SystemConfig values. It is filled on first use and
+# dropped whenever an admin changes the configuration.
+_system_config_cache = None
+
+def get_system_config(key, default=None):
+    """Return a typed system configuration value without hitting the database"""
+    global _system_config_cache
+    if _system_config_cache is None:
+        _system_config_cache = {
+            config.key: config.get_typed_value() for config in SystemConfig.query.all()
+        }
+    return _system_config_cache.get(key, default)
+
+def invalidate_system_config_cache():
+    """Force the next get_system_config call to reload from the database"""
+    global _system_config_cache
+    _system_config_cache = None
+
+def row_exists(query):
+    """Return whether a query matches any row, via EXISTS and without loading it"""
+    return db.session.query(query.exists()).scalar()
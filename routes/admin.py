@@ -1,275 +1,471 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
-from models import User, Location, db
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from functools import lru_cache, wraps
+from models import User, Location, SystemConfig, db
+from sqlalchemy import bindparam, func, lambda_stmt, or_, select
+from sqlalchemy.exc import IntegrityError
+from utils import (
+    hash_password,
+    hash_passwords,
+    cached_response,
+    invalidate_cached_responses,
+    ADMIN_USERS_CACHE_KEY,
+    ADMIN_LOCATIONS_CACHE_KEY
+)
+import json
+import time
+from itertools import chain
 
 admin_bp = Blueprint('admin', __name__)
 
+# Upper bound on users created by one batch request
+MAX_BATCH_USERS = 1000
+
+# Rows fetched and encoded per chunk of the streamed user list
+USER_STREAM_BATCH = 500
+
+# Plain columns update_user copies from the request; username, email,
+# location_id and password are validated separately
+USER_UPDATE_FIELDS = frozenset({'first_name', 'last_name', 'role', 'is_active'})
+
+# Role and active flag per user id, cached briefly so admin checks skip the
+# users table. Falls back to a per-process dict when Redis is not configured.
+ROLE_CACHE_TTL = 30
+_local_role_cache = {}
+
+# Cache-miss lookup, built once so each call only binds the user id
+_USER_AUTH_STMT = lambda_stmt(
+    lambda: select(User.role, User.is_active).where(User.id == bindparam('user_id'))
+)
+
+def _role_cache_key(user_id):
+    return f"user:role:{user_id}"
+
+def get_user_auth(user_id):
+    """Return {'role', 'is_active'} for a user, or None if it does not exist"""
+    redis_client = current_app.extensions.get('redis')
+    key = _role_cache_key(user_id)
+    try:
+        if redis_client is not None:
+            cached = redis_client.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        else:
+            cached = _local_role_cache.get(key)
+            if cached is not None and cached[0] > time.time():
+                return cached[1]
+    except Exception as e:
+        current_app.logger.debug(f"Role cache read failed: {e}")
+    
+    row = db.session.execute(_USER_AUTH_STMT, {'user_id': int(user_id)}).first()
+    if row is None:
+        return None
+    auth = {'role': row.role, 'is_active': bool(row.is_active)}
+    try:
+        if redis_client is not None:
+            redis_client.setex(key, ROLE_CACHE_TTL, json.dumps(auth))
+        else:
+            _local_role_cache[key] = (time.time() + ROLE_CACHE_TTL, auth)
+    except Exception as e:
+        current_app.logger.debug(f"Role cache write failed: {e}")
+    return auth
+
+def invalidate_user_auth(user_id):
+    """Drop a user's cached role after it may have changed"""
+    redis_client = current_app.extensions.get('redis')
+    key = _role_cache_key(user_id)
+    _local_role_cache.pop(key, None)
+    if redis_client is not None:
+        try:
+            redis_client.delete(key)
+        except Exception as e:
+            current_app.logger.debug(f"Role cache invalidation failed: {e}")
+
+def require_role(*roles, message='Insufficient permissions'):
+    """
+    Reject the request with 403 unless the JWT user is active and has one of
+    the given roles. Tokens carry the role as of login, so other roles are
+    turned away without a lookup; matching claims are still confirmed against
+    the cached role so demotions apply at once.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if get_jwt().get('role', roles[0]) not in roles:
+                return jsonify({'error': message}), 403
+            auth = get_user_auth(get_jwt_identity())
+            if not auth or not auth['is_active'] or auth['role'] not in roles:
+                return jsonify({'error': message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def require_admin(message):
+    """Reject the request with 403 unless the JWT user is an active admin"""
+    return require_role('admin', message=message)
+
+def _is_location_error(error):
+    """Whether an IntegrityError came from the users.location_id foreign key"""
+    message = str(error.orig).lower()
+    return 'location' in message or 'foreign key' in message
+
+def _serialize_location(location):
+    """Short location summary embedded in user payloads"""
+    if location is None:
+        return None
+    return {
+        'id': location.id,
+        'name': location.name,
+        'display_name': location.display_name
+    }
+
+# Columns of the admin user payload; the list endpoint selects just these
+USER_LIST_COLUMNS = (
+    User.id, User.username, User.email, User.first_name, User.last_name,
+    User.role, User.location_id, User.is_active, User.created_at
+)
+
+@lru_cache(maxsize=256)
+def _location_summary(location_id):
+    """Serialized location by id, kept until a location changes"""
+    return _serialize_location(db.session.get(Location, location_id))
+
+def invalidate_location_summaries():
+    """Forget cached location summaries after a location is created or edited"""
+    _location_summary.cache_clear()
+
+def _user_location(user):
+    return _location_summary(user.location_id) if user.location_id else None
+
+def _serialize_user(user, location):
+    """
+    User payload shared by the admin user endpoints. user may be a User or a
+    row of USER_LIST_COLUMNS; location is its serialized location or None.
+    """
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'role': user.role,
+        'location_id': user.location_id,
+        'is_active': user.is_active,
+        'created_at': user.created_at,
+        'location': location
+    }
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
+@require_admin('Only admins can view all users')
+@cached_response(ADMIN_USERS_CACHE_KEY)
 def get_all_users():
     """Get all users with location information (admin only)"""
-    try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can view all users'}), 403
-        
-        users = User.query.all()
-        users_data = []
-        
-        for user in users:
-            user_data = {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'role': user.role,
-                'location_id': user.location_id,
-                'is_active': user.is_active,
-                'created_at': user.created_at.isoformat()
-            }
-            
-            # Add location information
-            if user.user_location:
-                user_data['location'] = {
-                    'id': user.user_location.id,
-                    'name': user.user_location.name,
-                    'display_name': user.user_location.display_name
-                }
-            else:
-                user_data['location'] = None
-            
-            users_data.append(user_data)
-        
-        return jsonify({'users': users_data}), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    stmt = select(*USER_LIST_COLUMNS, Location).outerjoin(
+        Location, User.location_id == Location.id
+    ).execution_options(yield_per=USER_STREAM_BATCH)
+    dumps = current_app.json.dumps
+    
+    # Run the query and fetch the first batch before answering, so a failing
+    # query still becomes a 500 instead of a truncated 200
+    batches = db.session.execute(stmt).partitions()
+    first = next(batches, None)
+    
+    # Stream {"users": [...]} one fetched batch at a time instead of building
+    # the whole list and its encoded body in memory
+    def generate():
+        separator = b''
+        yield b'{"users":['
+        try:
+            for rows in chain([first] if first else [], batches):
+                chunk = b','.join(
+                    dumps(_serialize_user(row, _serialize_location(row.Location))).encode()
+                    for row in rows
+                )
+                yield separator + chunk
+                separator = b','
+        except Exception:
+            # Headers are gone; abort the body so it is never taken (or
+            # cached) as a complete list
+            current_app.logger.exception("Admin user list stream failed")
+            raise
+        yield b']}\n'
+    
+    return current_app.response_class(
+        stream_with_context(generate()), mimetype='application/json'
+    )
 
 @admin_bp.route('/users', methods=['POST'])
 @jwt_required()
+@require_admin('Only admins can create users')
 def create_user():
     """Create a new user (admin only)"""
+    data = request.get_json()
+    
+    # Validate required fields
+    required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({'error': f'{field} is required'}), 400
+    
+    # Hash before the first query so the deliberately slow hash does not
+    # run while this request holds a pooled connection
+    password_hash = hash_password(data['password'])
+    
+    # Check if username or email already exists
+    existing = db.session.query(User.username, User.email).filter(
+        or_(User.username == data['username'], User.email == data['email'])
+    ).all()
+    if any(row.username == data['username'] for row in existing):
+        return jsonify({'error': 'Username already exists'}), 400
+    if any(row.email == data['email'] for row in existing):
+        return jsonify({'error': 'Email already exists'}), 400
+    
+    # Create new user
+    new_user = User(
+        username=data['username'],
+        email=data['email'],
+        password_hash=password_hash,
+        first_name=data['first_name'],
+        last_name=data['last_name'],
+        role=data.get('role', 'waiter'),
+        location_id=data.get('location_id') or None,
+        is_active=data.get('is_active', True)
+    )
+    
+    db.session.add(new_user)
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can create users'}), 403
-        
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        # Check if username or email already exists
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'error': 'Username already exists'}), 400
-        
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'error': 'Email already exists'}), 400
-        
-        # Validate location if provided
-        location_id = data.get('location_id')
-        if location_id:
-            location = Location.query.get(location_id)
-            if not location:
-                return jsonify({'error': 'Invalid location'}), 400
-        
-        # Create new user
-        new_user = User(
-            username=data['username'],
-            email=data['email'],
-            password_hash=generate_password_hash(data['password']),
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            role=data.get('role', 'waiter'),
-            location_id=location_id,
-            is_active=data.get('is_active', True)
-        )
-        
-        db.session.add(new_user)
         db.session.commit()
-        
-        # Return user data with location info
-        user_data = {
-            'id': new_user.id,
-            'username': new_user.username,
-            'email': new_user.email,
-            'first_name': new_user.first_name,
-            'last_name': new_user.last_name,
-            'role': new_user.role,
-            'location_id': new_user.location_id,
-            'is_active': new_user.is_active
+    except IntegrityError as e:
+        db.session.rollback()
+        if _is_location_error(e):
+            return jsonify({'error': 'Invalid location'}), 400
+        raise
+    invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+    
+    # Return user data with location info
+    return jsonify({
+        'message': 'User created successfully',
+        'user': _serialize_user(new_user, _user_location(new_user))
+    }), 201
+
+@admin_bp.route('/users/batch', methods=['POST'])
+@jwt_required()
+@require_admin('Only admins can create users')
+def create_users_batch():
+    """Create many users in one transaction (admin only)"""
+    data = request.get_json() or {}
+    users = data.get('users')
+    if not isinstance(users, list) or not users:
+        return jsonify({'error': 'users must be a non-empty list'}), 400
+    if len(users) > MAX_BATCH_USERS:
+        return jsonify({'error': f'At most {MAX_BATCH_USERS} users per batch'}), 400
+    
+    # Validate required fields and duplicates inside the batch
+    required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
+    usernames, emails = set(), set()
+    for index, user_data in enumerate(users):
+        for field in required_fields:
+            if not user_data.get(field):
+                return jsonify({'error': f'users[{index}]: {field} is required'}), 400
+        if user_data['username'] in usernames:
+            return jsonify({'error': f"users[{index}]: duplicate username {user_data['username']}"}), 400
+        if user_data['email'] in emails:
+            return jsonify({'error': f"users[{index}]: duplicate email {user_data['email']}"}), 400
+        usernames.add(user_data['username'])
+        emails.add(user_data['email'])
+    
+    # Check every username and email against the table in one query
+    existing = db.session.query(User.username, User.email).filter(
+        or_(User.username.in_(usernames), User.email.in_(emails))
+    ).all()
+    taken_usernames = sorted(row.username for row in existing if row.username in usernames)
+    if taken_usernames:
+        return jsonify({'error': f'Usernames already exist: {", ".join(taken_usernames)}'}), 400
+    taken_emails = sorted(row.email for row in existing if row.email in emails)
+    if taken_emails:
+        return jsonify({'error': f'Emails already exist: {", ".join(taken_emails)}'}), 400
+    
+    password_hashes = hash_passwords([user_data['password'] for user_data in users])
+    rows = [
+        {
+            'username': user_data['username'],
+            'email': user_data['email'],
+            'password_hash': password_hash,
+            'first_name': user_data['first_name'],
+            'last_name': user_data['last_name'],
+            'role': user_data.get('role', 'waiter'),
+            'location_id': user_data.get('location_id') or None,
+            'is_active': user_data.get('is_active', True)
         }
-        
-        if new_user.user_location:
-            user_data['location'] = {
-                'id': new_user.user_location.id,
-                'name': new_user.user_location.name,
-                'display_name': new_user.user_location.display_name
-            }
-        else:
-            user_data['location'] = None
-        
-        return jsonify({
-            'message': 'User created successfully',
-            'user': user_data
-        }), 201
-        
-    except Exception as e:
+        for user_data, password_hash in zip(users, password_hashes)
+    ]
+    
+    try:
+        db.session.bulk_insert_mappings(User, rows)
+        db.session.commit()
+    except IntegrityError as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        if _is_location_error(e):
+            return jsonify({'error': 'Invalid location'}), 400
+        raise
+    invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+    
+    return jsonify({
+        'message': f'{len(rows)} users created successfully',
+        'created': len(rows)
+    }), 201
 
 @admin_bp.route('/users/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@require_admin('Only admins can update users')
 def update_user(user_id):
     """Update a user (admin only)"""
+    data = request.get_json()
+    
+    # Hash before the first query (see create_user)
+    password_hash = hash_password(data['password']) if data.get('password') else None
+    
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    # Check new username/email for uniqueness in one query
+    new_email = data['email'] if 'email' in data and data['email'] != user.email else None
+    new_username = data['username'] if 'username' in data and data['username'] != user.username else None
+    unique_checks = []
+    if new_email is not None:
+        unique_checks.append(User.email == new_email)
+    if new_username is not None:
+        unique_checks.append(User.username == new_username)
+    if unique_checks:
+        existing = db.session.query(User.username, User.email).filter(or_(*unique_checks)).all()
+        if new_email is not None and any(row.email == new_email for row in existing):
+            return jsonify({'error': 'Email already exists'}), 400
+        if new_username is not None and any(row.username == new_username for row in existing):
+            return jsonify({'error': 'Username already exists'}), 400
+    
+    # Update allowed fields; unchanged values are left out of the UPDATE
+    for field in USER_UPDATE_FIELDS & data.keys():
+        setattr(user, field, data[field])
+    if new_email is not None:
+        user.email = new_email
+    if new_username is not None:
+        user.username = new_username
+    
+    # Handle location assignment
+    if 'location_id' in data:
+        user.location_id = data['location_id'] or None
+    
+    # Password update
+    if password_hash:
+        user.password_hash = password_hash
+    
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can update users'}), 403
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        data = request.get_json()
-        
-        # Update allowed fields
-        if 'first_name' in data:
-            user.first_name = data['first_name']
-        if 'last_name' in data:
-            user.last_name = data['last_name']
-        if 'email' in data:
-            # Check if email is unique
-            if data['email'] != user.email:
-                existing_email = User.query.filter_by(email=data['email']).first()
-                if existing_email:
-                    return jsonify({'error': 'Email already exists'}), 400
-            user.email = data['email']
-        if 'username' in data:
-            # Check if username is unique
-            if data['username'] != user.username:
-                existing_username = User.query.filter_by(username=data['username']).first()
-                if existing_username:
-                    return jsonify({'error': 'Username already exists'}), 400
-            user.username = data['username']
-        if 'role' in data:
-            user.role = data['role']
-        if 'is_active' in data:
-            user.is_active = data['is_active']
-        
-        # Handle location assignment
-        if 'location_id' in data:
-            location_id = data['location_id']
-            if location_id:
-                location = Location.query.get(location_id)
-                if not location:
-                    return jsonify({'error': 'Invalid location'}), 400
-                user.location_id = location_id
-            else:
-                user.location_id = None
-        
-        # Password update
-        if 'password' in data and data['password']:
-            user.password_hash = generate_password_hash(data['password'])
-        
         db.session.commit()
-        
-        # Return updated user data with location info
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'role': user.role,
-            'location_id': user.location_id,
-            'is_active': user.is_active
-        }
-        
-        if user.user_location:
-            user_data['location'] = {
-                'id': user.user_location.id,
-                'name': user.user_location.name,
-                'display_name': user.user_location.display_name
-            }
-        else:
-            user_data['location'] = None
-        
-        return jsonify({
-            'message': 'User updated successfully',
-            'user': user_data
-        }), 200
-        
-    except Exception as e:
+    except IntegrityError as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        if _is_location_error(e):
+            return jsonify({'error': 'Invalid location'}), 400
+        raise
+    invalidate_user_auth(user.id)
+    invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+    
+    # Return updated user data with location info
+    return jsonify({
+        'message': 'User updated successfully',
+        'user': _serialize_user(user, _user_location(user))
+    }), 200
 
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
 @jwt_required()
+@require_admin('Only admins can delete users')
 def delete_user(user_id):
     """Delete a user (admin only)"""
-    try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can delete users'}), 403
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Prevent admin from deleting themselves
-        if user.id == current_user_id:
-            return jsonify({'error': 'Cannot delete your own account'}), 400
-        
-        # Soft delete - mark as inactive
-        user.is_active = False
-        db.session.commit()
-        
-        return jsonify({'message': 'User deleted successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    current_user_id = int(get_jwt_identity())
+    
+    # Prevent admin from deleting themselves
+    if user_id == current_user_id:
+        return jsonify({'error': 'Cannot delete your own account'}), 400
+    
+    # Soft delete - mark as inactive with a single UPDATE
+    updated = User.query.filter_by(id=user_id).update(
+        {'is_active': False}, synchronize_session=False
+    )
+    db.session.commit()
+    if not updated:
+        return jsonify({'error': 'User not found'}), 404
+    invalidate_user_auth(user_id)
+    invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+    
+    return jsonify({'message': 'User deleted successfully'}), 200
 
 @admin_bp.route('/locations', methods=['GET'])
 @jwt_required()
+@require_admin('Only admins can view all locations')
+@cached_response(ADMIN_LOCATIONS_CACHE_KEY)
 def get_all_locations():
     """Get all locations (admin only)"""
-    try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can view all locations'}), 403
-        
-        locations = Location.query.all()
-        locations_data = []
-        
-        for location in locations:
-            locations_data.append({
-                'id': location.id,
-                'name': location.name,
-                'display_name': location.display_name,
-                'description': location.description,
-                'is_active': location.is_active,
-                'created_at': location.created_at.isoformat(),
-                'user_count': len([u for u in location.users if u.is_active])
-            })
-        
-        return jsonify({'locations': locations_data}), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    locations = Location.query.all()
+    user_counts = dict(
+        db.session.query(User.location_id, func.count())
+        .filter(User.is_active.is_(True))
+        .group_by(User.location_id)
+        .all()
+    )
+    locations_data = []
+    
+    for location in locations:
+        locations_data.append({
+            'id': location.id,
+            'name': location.name,
+            'display_name': location.display_name,
+            'description': location.description,
+            'is_active': location.is_active,
+            'created_at': location.created_at,
+            'user_count': user_counts.get(location.id, 0)
+        })
+    
+    return jsonify({'locations': locations_data}), 200
+
+@admin_bp.route('/system-config', methods=['GET'])
+@jwt_required()
+@require_admin('Only admins can view system configuration')
+def get_system_configs():
+    """Get all system configuration values (admin only)"""
+    configs = SystemConfig.query.order_by(SystemConfig.key).all()
+    
+    return jsonify({'configs': [config.to_dict() for config in configs]}), 200
+
+@admin_bp.route('/system-config', methods=['PUT'])
+@jwt_required()
+@require_admin('Only admins can update system configuration')
+def update_system_configs():
+    """Update system configuration values (admin only)"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'Request body must be JSON'}), 400
+    
+    configs = SystemConfig.query.filter(SystemConfig.key.in_(list(data.keys()))).all()
+    unknown_keys = set(data.keys()) - {config.key for config in configs}
+    if unknown_keys:
+        return jsonify({'error': f'Unknown configuration keys: {", ".join(sorted(unknown_keys))}'}), 400
+    
+    for config in configs:
+        value = data[config.key]
+        if config.data_type == 'json':
+            config.value = json.dumps(value)
+        elif config.data_type == 'boolean':
+            config.value = 'true' if value in (True, 'true', '1', 'yes') else 'false'
+        else:
+            config.value = str(value)
+    
+    db.session.commit()
+    
+    # Refresh the cached configuration in every worker
+    current_app.extensions['notify_config_changed']([config.key for config in configs])
+    
+    return jsonify({
+        'message': 'System configuration updated successfully',
+        'configs': [config.to_dict() for config in configs]
+    }), 200
\ No newline at end of file
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import (
     create_access_token, 
     create_refresh_token,
@@ -9,10 +9,19 @@ from flask_jwt_extended import (
 )
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from werkzeug.security import check_password_hash, generate_password_hash
-from models import User, RefreshToken, AuditLog, db
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload
+from models import User, RefreshToken, AuditLog, db, row_exists, _utcnow
+from routes.admin import USER_STREAM_BATCH, get_user_auth, invalidate_user_auth
+from utils import verify_password, verify_dummy_password, warm_dummy_password_hash, invalidate_cached_responses, ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY
 from datetime import timedelta, datetime
 import re
+import string
+import time
+import queue
+import atexit
+import threading
+from itertools import chain
 from email_validator import validate_email, EmailNotValidError
 
 auth_bp = Blueprint('auth', __name__)
@@ -20,6 +29,28 @@ auth_bp = Blueprint('auth', __name__)
 # Rate limiter for auth routes
 limiter = Limiter(key_func=get_remote_address)
 
+# Password character classes as bit flags in a byte lookup table, so one
+# bytes.translate pass (in C) classifies the whole password
+_HAS_UPPER, _HAS_LOWER, _HAS_DIGIT, _HAS_SPECIAL = 1, 2, 4, 8
+_ALL_CLASSES = _HAS_UPPER | _HAS_LOWER | _HAS_DIGIT | _HAS_SPECIAL
+
+def _build_class_lut():
+    lut = bytearray(256)
+    for chars, flag in ((string.ascii_uppercase, _HAS_UPPER), (string.ascii_lowercase, _HAS_LOWER),
+                        (string.digits, _HAS_DIGIT), ('!@#$%^&*(),.?":{}|<>', _HAS_SPECIAL)):
+        for c in chars.encode():
+            lut[c] = flag
+    return bytes(lut)
+
+_CLASS_LUT = _build_class_lut()
+_WEAK_LITERALS = ('123456', 'password', 'qwerty', 'admin', 'letmein')
+
+# Auth events are written off the request path in batches
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 0.1  # seconds
+_audit_queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+
 def validate_password_strength(password):
     """Enhanced password validation"""
     errors = []
@@ -27,49 +58,94 @@ def validate_password_strength(password):
     if len(password) < 8:
         errors.append("Password must be at least 8 characters long")
     
-    if not re.search(r'[A-Z]', password):
-        errors.append("Password must contain at least one uppercase letter")
-    
-    if not re.search(r'[a-z]', password):
-        errors.append("Password must contain at least one lowercase letter")
+    classes = 0
+    for flag in set(password.encode('utf-8', 'ignore').translate(_CLASS_LUT)):
+        classes |= flag
     
-    if not re.search(r'\d', password):
-        errors.append("Password must contain at least one number")
-    
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        errors.append("Password must contain at least one special character")
+    # Typical passwords have every class; skip the per-class checks then
+    if classes != _ALL_CLASSES:
+        if not classes & _HAS_UPPER:
+            errors.append("Password must contain at least one uppercase letter")
+        if not classes & _HAS_LOWER:
+            errors.append("Password must contain at least one lowercase letter")
+        if not classes & _HAS_DIGIT:
+            errors.append("Password must contain at least one number")
+        if not classes & _HAS_SPECIAL:
+            errors.append("Password must contain at least one special character")
     
     # Check for common weak patterns
-    weak_patterns = [
-        r'123456',
-        r'password',
-        r'qwerty',
-        r'admin',
-        r'letmein'
-    ]
-    
-    for pattern in weak_patterns:
-        if re.search(pattern, password.lower()):
-            errors.append("Password contains common weak patterns")
-            break
+    password_lower = password.lower()
+    if any(weak in password_lower for weak in _WEAK_LITERALS):
+        errors.append("Password contains common weak patterns")
     
     return errors
 
+def _drain_audit_queue(block=True):
+    """Collect up to AUDIT_BATCH_SIZE queued audit rows, waiting at most AUDIT_FLUSH_INTERVAL"""
+    batch = []
+    try:
+        batch.append(_audit_queue.get(block=block))
+    except queue.Empty:
+        return batch
+    deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+    while len(batch) < AUDIT_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            if block and remaining > 0:
+                batch.append(_audit_queue.get(timeout=remaining))
+            else:
+                batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def _write_audit_batch(app, batch):
+    """Insert a batch of audit rows in a single commit"""
+    with app.app_context():
+        try:
+            db.session.bulk_insert_mappings(AuditLog, batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to write {len(batch)} auth events: {str(e)}")
+
+def _audit_writer(app):
+    while True:
+        _write_audit_batch(app, _drain_audit_queue())
+
+def _flush_audit_queue(app):
+    """Write whatever is still queued on shutdown"""
+    while True:
+        batch = _drain_audit_queue(block=False)
+        if not batch:
+            break
+        _write_audit_batch(app, batch)
+
+@auth_bp.record_once
+def _start_audit_writer(state):
+    threading.Thread(target=_audit_writer, args=(state.app,), name='audit-writer', daemon=True).start()
+    atexit.register(_flush_audit_queue, state.app)
+
+@auth_bp.record_once
+def _warm_dummy_password_hash(state):
+    # A lazily built dummy hash would make the first unknown-user login
+    # slower than a wrong password, which is the signal it exists to hide
+    warm_dummy_password_hash()
+
 def log_auth_event(user_id, action, success, ip_address, user_agent, details=None):
-    """Log authentication events for audit purposes"""
+    """Queue an authentication event for the background audit writer"""
     try:
-        log_entry = AuditLog(
-            user_id=user_id,
-            action=action,
-            resource_type='authentication',
-            ip_address=ip_address,
-            user_agent=user_agent,
-            new_values=f"Success: {success}, Details: {details or 'None'}"
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        current_app.logger.error(f"Failed to log auth event: {str(e)}")
+        _audit_queue.put_nowait({
+            'user_id': user_id,
+            'action': action,
+            'resource_type': 'authentication',
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'new_values': {'success': success, 'details': details},
+            'created_at': _utcnow()
+        })
+    except queue.Full:
+        current_app.logger.warning(f"Audit queue full, dropping auth event: {action}")
 
 @auth_bp.route('/login', methods=['POST'])
 @limiter.limit("10 per minute")
@@ -115,6 +191,8 @@ def login():
         description: Too many login attempts
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         data = request.get_json()
         if not data:
             return jsonify({'error': 'Request body must be JSON'}), 400
@@ -125,15 +203,19 @@ def login():
         if not username or not password:
             return jsonify({'error': 'Username and password are required'}), 400
         
-        # Find user by username or email
-        user = User.query.filter(
-            (User.username == username) | (User.email == username)
-        ).first()
-        
-        ip_address = get_remote_address()
-        user_agent = request.headers.get('User-Agent', '')
+        # Find user by username or email; an identifier without '@' cannot
+        # be an email, so each branch is a single unique-index lookup. The
+        # location is joined in for the response.
+        users = User.query.options(joinedload(User.user_location))
+        if '@' in username:
+            user = users.filter(User.email == username).first()
+            if user is None:
+                user = users.filter(User.username == username).first()
+        else:
+            user = users.filter(User.username == username).first()
         
         if not user:
+            verify_dummy_password(password)
             # Log failed login attempt
             log_auth_event(None, 'login_failed', False, ip_address, user_agent, 'User not found')
             return jsonify({'error': 'Invalid credentials'}), 401
@@ -143,7 +225,7 @@ def login():
             log_auth_event(user.id, 'login_blocked', False, ip_address, user_agent, 'Account locked')
             return jsonify({
                 'error': 'Account is temporarily locked due to too many failed login attempts',
-                'locked_until': user.locked_until.isoformat() if user.locked_until else None
+                'locked_until': user.locked_until
             }), 401
         
         # Check if account is active
@@ -161,7 +243,7 @@ def login():
             if remaining_attempts <= 0:
                 return jsonify({
                     'error': 'Account has been locked due to too many failed login attempts',
-                    'locked_until': user.locked_until.isoformat() if user.locked_until else None
+                    'locked_until': user.locked_until
                 }), 401
             else:
                 return jsonify({
@@ -169,26 +251,31 @@ def login():
                     'remaining_attempts': remaining_attempts
                 }), 401
         
-        # Successful login - update user and create tokens
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        # Successful login - check_password already reset the attempt
+        # counter and stamped last_login; it is committed with the token below
         
         # Create tokens
         access_token = create_access_token(
             identity=str(user.id),
+            additional_claims={'role': user.role},
             expires_delta=timedelta(hours=1)
         )
         
+        # The server-side row is keyed by the refresh JWT's own jti, so
+        # revoking the row revokes that token. The jti is a UUIDv7 so new
+        # rows still append to the right edge of the unique token index.
+        refresh_jti = RefreshToken.generate_token()
         refresh_token_str = create_refresh_token(
             identity=str(user.id),
+            additional_claims={'jti': refresh_jti},
             expires_delta=timedelta(days=30)
         )
         
         # Store refresh token in database
         refresh_token = RefreshToken(
             user_id=user.id,
-            token=RefreshToken.generate_token(),
-            expires_at=datetime.utcnow() + timedelta(days=30)
+            token=refresh_jti,
+            expires_at=_utcnow() + timedelta(days=30)
         )
         db.session.add(refresh_token)
         db.session.commit()
@@ -209,11 +296,12 @@ def login():
                 'role': user.role,
                 'location_id': user.location_id,
                 'location': user.user_location.name if user.user_location else None,
-                'last_login': user.last_login.isoformat() if user.last_login else None
+                'last_login': user.last_login
             }
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
@@ -240,15 +328,22 @@ def refresh():
         description: Invalid or expired refresh token
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
         
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 401
         
+        # Refused once logout or a password change has revoked its row
+        if row_exists(RefreshToken.query.filter_by(token=get_jwt()['jti'], is_revoked=True)):
+            return jsonify({'error': 'Refresh token has been revoked'}), 401
+        
         # Create new access token
         access_token = create_access_token(
             identity=str(user.id),
+            additional_claims={'role': user.role},
             expires_delta=timedelta(hours=1)
         )
         
@@ -257,8 +352,8 @@ def refresh():
             user.id, 
             'token_refresh', 
             True, 
-            get_remote_address(), 
-            request.headers.get('User-Agent', '')
+            ip_address,
+            user_agent
         )
         
         return jsonify({'access_token': access_token}), 200
@@ -285,17 +380,18 @@ def logout():
         description: Invalid token
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = get_jwt_identity()
-        jti = get_jwt()['jti']
+        claims = get_jwt()
         
-        # Add token to blacklist (in production, use Redis)
-        from app import blacklisted_tokens
-        blacklisted_tokens.add(jti)
+        # Add token to blocklist until it would have expired
+        current_app.extensions['revoke_token'](claims['jti'], claims['exp'])
         
         # Revoke all refresh tokens for this user
         RefreshToken.query.filter_by(user_id=current_user_id, is_revoked=False).update({
             'is_revoked': True
-        })
+        }, synchronize_session=False)
         db.session.commit()
         
         # Log logout
@@ -303,8 +399,8 @@ def logout():
             current_user_id, 
             'logout', 
             True, 
-            get_remote_address(), 
-            request.headers.get('User-Agent', '')
+            ip_address,
+            user_agent
         )
         
         return jsonify({'message': 'Successfully logged out'}), 200
@@ -361,11 +457,15 @@ def register():
         description: Insufficient permissions
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_user_auth(current_user_id)
+        if current_user is None:
+            return jsonify({'error': 'User not found'}), 404
         
         # Only admin and manager can create new users
-        if current_user.role not in ['admin', 'manager']:
+        if current_user['role'] not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
         data = request.get_json()
@@ -383,7 +483,7 @@ def register():
         
         # Validate email format
         try:
-            validate_email(data['email'])
+            validate_email(data['email'], check_deliverability=False)
         except EmailNotValidError as e:
             return jsonify({'error': f'Invalid email format: {str(e)}'}), 400
         
@@ -403,8 +503,8 @@ def register():
             }), 400
         
         # Check if username or email already exists
-        existing_user = User.query.filter(
-            (User.username == username) | (User.email == data['email'])
+        existing_user = db.session.query(User.username).filter(
+            or_(User.username == username, User.email == data['email'])
         ).first()
         
         if existing_user:
@@ -423,7 +523,7 @@ def register():
             }), 400
         
         # Only admin can create admin users
-        if role == 'admin' and current_user.role != 'admin':
+        if role == 'admin' and current_user['role'] != 'admin':
             return jsonify({'error': 'Only admin users can create admin accounts'}), 403
         
         # Create new user
@@ -444,14 +544,15 @@ def register():
         
         db.session.add(new_user)
         db.session.commit()
+        invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
         
         # Log user creation
         log_auth_event(
-            current_user.id, 
+            current_user_id, 
             'user_created', 
             True, 
-            get_remote_address(), 
-            request.headers.get('User-Agent', ''),
+            ip_address,
+            user_agent,
             f"Created user: {new_user.username} ({new_user.role})"
         )
         
@@ -467,7 +568,7 @@ def register():
                 'role': new_user.role,
                 'location_id': new_user.location_id,
                 'is_active': new_user.is_active,
-                'created_at': new_user.created_at.isoformat()
+                'created_at': new_user.created_at
             }
         }), 201
         
@@ -549,6 +650,8 @@ def change_password():
         description: Invalid current password
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = int(get_jwt_identity())
         user = User.query.get(current_user_id)
         
@@ -566,13 +669,13 @@ def change_password():
             return jsonify({'error': 'Current password and new password are required'}), 400
         
         # Verify current password
-        if not check_password_hash(user.password_hash, current_password):
+        if not verify_password(user.password_hash, current_password):
             log_auth_event(
                 user.id, 
                 'password_change_failed', 
                 False, 
-                get_remote_address(), 
-                request.headers.get('User-Agent', ''),
+                ip_address,
+                user_agent,
                 'Invalid current password'
             )
             return jsonify({'error': 'Current password is incorrect'}), 401
@@ -586,17 +689,17 @@ def change_password():
             }), 400
         
         # Check if new password is different from current
-        if check_password_hash(user.password_hash, new_password):
+        if verify_password(user.password_hash, new_password):
             return jsonify({'error': 'New password must be different from current password'}), 400
         
         # Update password
         user.set_password(new_password)
-        db.session.commit()
         
-        # Revoke all refresh tokens to force re-login on other devices
+        # Revoke all refresh tokens to force re-login on other devices, in the
+        # same commit as the password change
         RefreshToken.query.filter_by(user_id=user.id, is_revoked=False).update({
             'is_revoked': True
-        })
+        }, synchronize_session=False)
         db.session.commit()
         
         # Log password change
@@ -604,8 +707,8 @@ def change_password():
             user.id, 
             'password_changed', 
             True, 
-            get_remote_address(), 
-            request.headers.get('User-Agent', '')
+            ip_address,
+            user_agent
         )
         
         return jsonify({'message': 'Password changed successfully'}), 200
@@ -615,6 +718,43 @@ def change_password():
         current_app.logger.error(f"Change password error: {str(e)}")
         return jsonify({'error': 'Failed to change password'}), 500
 
+# Columns get_users reads, so listings skip password hashes and ORM instances
+USER_LIST_COLUMNS = (
+    User.id, User.username, User.email, User.first_name, User.last_name,
+    User.role, User.location_id, User.is_active, User.last_login,
+    User.created_at, User.updated_at
+)
+USER_SENSITIVE_COLUMNS = (User.failed_login_attempts, User.locked_until, User.password_changed_at)
+MAX_USER_PAGE_SIZE = 200
+# created_at is nullable; page on it with NULLs folded to the epoch so those
+# rows sort last and still have a position to resume from
+USER_CURSOR_EPOCH = datetime(1970, 1, 1)
+
+def _user_row_to_dict(row, include_sensitive):
+    """Same shape as User.to_dict, built from a column row"""
+    data = {
+        'id': row.id,
+        'username': row.username,
+        'email': row.email,
+        'first_name': row.first_name,
+        'last_name': row.last_name,
+        'full_name': row.first_name + ' ' + row.last_name,
+        'role': row.role,
+        'location_id': row.location_id,
+        'is_active': row.is_active,
+        'last_login': row.last_login,
+        'created_at': row.created_at,
+        'updated_at': row.updated_at
+    }
+    if include_sensitive:
+        data.update({
+            'failed_login_attempts': row.failed_login_attempts,
+            'is_locked': row.locked_until is not None and row.locked_until > _utcnow(),
+            'locked_until': row.locked_until,
+            'password_changed_at': row.password_changed_at
+        })
+    return data
+
 @auth_bp.route('/users', methods=['GET'])
 @jwt_required()
 @limiter.limit("50 per minute")
@@ -639,6 +779,14 @@ def get_users():
         name: is_active
         type: boolean
         description: Filter by active status
+      - in: query
+        name: page_size
+        type: integer
+        description: Page size (max 200); all users when omitted
+      - in: query
+        name: cursor
+        type: string
+        description: next_cursor from the previous page
     responses:
       200:
         description: List of users
@@ -647,10 +795,12 @@ def get_users():
     """
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_user_auth(current_user_id)
+        if current_user is None:
+            return jsonify({'error': 'User not found'}), 404
         
         # Only admin and manager can view all users
-        if current_user.role not in ['admin', 'manager']:
+        if current_user['role'] not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
         # Build query with filters
@@ -669,16 +819,66 @@ def get_users():
         if is_active is not None:
             query = query.filter_by(is_active=is_active.lower() == 'true')
         
-        users = query.order_by(User.created_at.desc()).all()
+        # Optional keyset paging on (created_at, id), newest first. The cursor
+        # is the last row's "created_at,id" so deep pages need no OFFSET scan.
+        created_at = func.coalesce(User.created_at, USER_CURSOR_EPOCH)
+        page_size = request.args.get('page_size', type=int)
+        if page_size is not None:
+            page_size = max(1, min(page_size, MAX_USER_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_ts, cursor_id = cursor.rsplit(',', 1)
+                cursor_ts, cursor_id = datetime.fromisoformat(cursor_ts), int(cursor_id)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(or_(
+                created_at < cursor_ts,
+                and_(created_at == cursor_ts, User.id < cursor_id)
+            ))
         
         # Include sensitive info only for admins
-        include_sensitive = current_user.role == 'admin'
-        users_data = [user.to_dict(include_sensitive=include_sensitive) for user in users]
-        
-        return jsonify({
-            'users': users_data,
-            'total': len(users_data)
-        }), 200
+        include_sensitive = current_user['role'] == 'admin'
+        columns = USER_LIST_COLUMNS + (USER_SENSITIVE_COLUMNS if include_sensitive else ())
+        query = query.with_entities(*columns).order_by(created_at.desc(), User.id.desc())
+        dumps = current_app.json.dumps
+        
+        # Fetch the first batch before answering so a failing query is still
+        # reported as a 500 instead of a truncated 200. A page is small enough
+        # to fetch whole, which also settles its cursor up front.
+        next_cursor = None
+        if page_size is None:
+            stmt = query.statement.execution_options(yield_per=USER_STREAM_BATCH)
+            batches = db.session.execute(stmt).partitions()
+            first = next(batches, None)
+        else:
+            first = db.session.execute(query.limit(page_size).statement).all()
+            batches = iter(())
+            if len(first) == page_size:
+                last = first[-1]
+                next_cursor = f'{(last.created_at or USER_CURSOR_EPOCH).isoformat()},{last.id}'
+        
+        # Stream {"users": [...], "total": n} a fetched batch at a time
+        def generate():
+            separator = b''
+            total = 0
+            yield b'{"users":['
+            try:
+                for rows in chain([first] if first else [], batches):
+                    yield separator + b','.join(
+                        dumps(_user_row_to_dict(row, include_sensitive)).encode() for row in rows
+                    )
+                    separator = b','
+                    total += len(rows)
+            except Exception:
+                # Headers are gone; abort the body rather than end it as valid JSON
+                current_app.logger.exception("User list stream failed")
+                raise
+            yield f'],"total":{total},"next_cursor":{dumps(next_cursor)}}}\n'.encode()
+        
+        return current_app.response_class(
+            stream_with_context(generate()), mimetype='application/json'
+        )
         
     except Exception as e:
         current_app.logger.error(f"Get users error: {str(e)}")
@@ -728,8 +928,12 @@ def update_user(user_id):
         description: User not found
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_user_auth(current_user_id)
+        if current_user is None:
+            return jsonify({'error': 'User not found'}), 404
         
         user = User.query.get(user_id)
         if not user:
@@ -737,8 +941,8 @@ def update_user(user_id):
         
         # Check permissions
         can_edit = (
-            current_user.role == 'admin' or
-            (current_user.role == 'manager' and user.role != 'admin') or
+            current_user['role'] == 'admin' or
+            (current_user['role'] == 'manager' and user.role != 'admin') or
             current_user_id == user_id
         )
         
@@ -766,14 +970,13 @@ def update_user(user_id):
         if 'email' in data:
             # Validate email format
             try:
-                validate_email(data['email'])
+                validate_email(data['email'], check_deliverability=False)
             except EmailNotValidError as e:
                 return jsonify({'error': f'Invalid email format: {str(e)}'}), 400
             
             # Check if email is unique
             if data['email'] != user.email:
-                existing_email = User.query.filter_by(email=data['email']).first()
-                if existing_email:
+                if row_exists(User.query.filter_by(email=data['email'])):
                     return jsonify({'error': 'Email already exists'}), 400
                 
                 old_value = user.email
@@ -781,10 +984,10 @@ def update_user(user_id):
                 changes['email'] = {'old': old_value, 'new': user.email}
         
         # Admin/Manager only fields
-        if current_user.role in ['admin', 'manager']:
+        if current_user['role'] in ['admin', 'manager']:
             if 'role' in data:
                 # Only admin can change roles to/from admin
-                if (data['role'] == 'admin' or user.role == 'admin') and current_user.role != 'admin':
+                if (data['role'] == 'admin' or user.role == 'admin') and current_user['role'] != 'admin':
                     return jsonify({'error': 'Only admin users can modify admin roles'}), 403
                 
                 if data['role'] in ['admin', 'manager', 'waiter']:
@@ -802,23 +1005,25 @@ def update_user(user_id):
                 user.location_id = data['location_id']
                 changes['location_id'] = {'old': old_value, 'new': user.location_id}
         
-        user.updated_at = datetime.utcnow()
+        user.updated_at = _utcnow()
         db.session.commit()
+        invalidate_user_auth(user.id)
+        invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
         
         # Log the changes
         if changes:
             log_auth_event(
-                current_user.id, 
+                current_user_id, 
                 'user_updated', 
                 True, 
-                get_remote_address(), 
-                request.headers.get('User-Agent', ''),
+                ip_address,
+                user_agent,
                 f"Updated user {user.username}: {changes}"
             )
         
         return jsonify({
             'message': 'User updated successfully',
-            'user': user.to_dict(include_sensitive=current_user.role == 'admin'),
+            'user': user.to_dict(include_sensitive=current_user['role'] == 'admin'),
             'changes': changes
         }), 200
         
@@ -852,11 +1057,15 @@ def unlock_user(user_id):
         description: User not found
     """
     try:
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', '')
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = get_user_auth(current_user_id)
+        if current_user is None:
+            return jsonify({'error': 'User not found'}), 404
         
         # Only admin and manager can unlock accounts
-        if current_user.role not in ['admin', 'manager']:
+        if current_user['role'] not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
         user = User.query.get(user_id)
@@ -870,11 +1079,11 @@ def unlock_user(user_id):
         
         # Log the unlock
         log_auth_event(
-            current_user.id, 
+            current_user_id, 
             'user_unlocked', 
             True, 
-            get_remote_address(), 
-            request.headers.get('User-Agent', ''),
+            ip_address,
+            user_agent,
             f"Unlocked user: {user.username}"
         )
         
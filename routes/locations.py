@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Location, User, db
+from flask_jwt_extended import jwt_required
+from models import Location, User, db, row_exists
+from sqlalchemy import func
 from decimal import Decimal
+from utils import invalidate_cached_responses, ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY
+from routes.admin import invalidate_location_summaries, require_admin
 
 locations_bp = Blueprint('locations', __name__)
 
@@ -12,6 +15,12 @@ def get_locations():
     """Get all locations"""
     try:
         locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+        user_counts = dict(
+            db.session.query(User.location_id, func.count())
+            .filter(User.is_active.is_(True))
+            .group_by(User.location_id)
+            .all()
+        )
         locations_data = []
         
         for location in locations:
@@ -21,8 +30,8 @@ def get_locations():
                 'display_name': location.display_name,
                 'description': location.description,
                 'is_active': location.is_active,
-                'created_at': location.created_at.isoformat(),
-                'user_count': len([u for u in location.users if u.is_active])
+                'created_at': location.created_at,
+                'user_count': user_counts.get(location.id, 0)
             })
         
         return jsonify({'locations': locations_data}), 200
@@ -33,15 +42,10 @@ def get_locations():
 @locations_bp.route('', methods=['POST'])
 @locations_bp.route('/', methods=['POST'])
 @jwt_required()
+@require_admin('Only admins can create locations')
 def create_location():
     """Create a new location (admin only)"""
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can create locations'}), 403
-        
         data = request.get_json()
         
         # Validate required fields
@@ -51,7 +55,7 @@ def create_location():
                 return jsonify({'error': f'{field} is required'}), 400
         
         # Check if location name already exists
-        if Location.query.filter_by(name=data['name']).first():
+        if row_exists(Location.query.filter_by(name=data['name'])):
             return jsonify({'error': 'Location name already exists'}), 400
         
         # Create new location
@@ -63,6 +67,8 @@ def create_location():
         
         db.session.add(new_location)
         db.session.commit()
+        invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+        invalidate_location_summaries()
         
         return jsonify({
             'message': 'Location created successfully',
@@ -81,15 +87,10 @@ def create_location():
 
 @locations_bp.route('/<int:location_id>', methods=['PUT'])
 @jwt_required()
+@require_admin('Only admins can update locations')
 def update_location(location_id):
     """Update a location (admin only)"""
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can update locations'}), 403
-        
         location = Location.query.get(location_id)
         if not location:
             return jsonify({'error': 'Location not found'}), 404
@@ -98,7 +99,7 @@ def update_location(location_id):
         
         # Check if name is being changed and if it's unique
         if 'name' in data and data['name'] != location.name:
-            if Location.query.filter_by(name=data['name']).first():
+            if row_exists(Location.query.filter_by(name=data['name'])):
                 return jsonify({'error': 'Location name already exists'}), 400
             location.name = data['name']
         
@@ -111,6 +112,8 @@ def update_location(location_id):
             location.is_active = data['is_active']
         
         db.session.commit()
+        invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+        invalidate_location_summaries()
         
         return jsonify({
             'message': 'Location updated successfully',
@@ -129,26 +132,23 @@ def update_location(location_id):
 
 @locations_bp.route('/<int:location_id>', methods=['DELETE'])
 @jwt_required()
+@require_admin('Only admins can delete locations')
 def delete_location(location_id):
     """Delete a location (admin only)"""
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can delete locations'}), 403
-        
         location = Location.query.get(location_id)
         if not location:
             return jsonify({'error': 'Location not found'}), 404
         
         # Check if location has users assigned
-        if location.users:
+        if row_exists(User.query.filter_by(location_id=location_id)):
             return jsonify({'error': 'Cannot delete location with assigned users. Please reassign users first.'}), 400
         
         # Soft delete - mark as inactive
         location.is_active = False
         db.session.commit()
+        invalidate_cached_responses(ADMIN_USERS_CACHE_KEY, ADMIN_LOCATIONS_CACHE_KEY)
+        invalidate_location_summaries()
         
         return jsonify({'message': 'Location deleted successfully'}), 200
         
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import MenuItem, Category, User, db
-from sqlalchemy import or_
+from models import MenuItem, Category, User, db, row_exists
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload, undefer_group
+from routes.admin import require_role
 
 menu_bp = Blueprint('menu', __name__)
 
@@ -10,6 +12,12 @@ menu_bp = Blueprint('menu', __name__)
 def get_categories():
     try:
         categories = Category.query.filter_by(is_active=True).order_by(Category.sort_order).all()
+        item_counts = dict(
+            db.session.query(MenuItem.category_id, func.count())
+            .filter(MenuItem.is_available.is_(True))
+            .group_by(MenuItem.category_id)
+            .all()
+        )
         categories_data = []
         
         for category in categories:
@@ -20,7 +28,7 @@ def get_categories():
                 'image_url': category.image_url,
                 'sort_order': category.sort_order,
                 'printer_destination': category.printer_destination,
-                'item_count': len([item for item in category.menu_items if item.is_available])
+                'item_count': item_counts.get(category.id, 0)
             })
         
         return jsonify({'categories': categories_data}), 200
@@ -30,14 +38,9 @@ def get_categories():
 
 @menu_bp.route('/categories', methods=['POST'])
 @jwt_required()
+@require_role('admin', 'manager')
 def create_category():
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         data = request.get_json()
         
         if not data.get('name'):
@@ -72,13 +75,9 @@ def create_category():
 
 @menu_bp.route('/categories/<int:category_id>', methods=['DELETE'])
 @jwt_required()
+@require_role('admin', 'manager')
 def delete_category(category_id):
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-
         category = Category.query.get(category_id)
         if not category or not category.is_active:
             return jsonify({'error': 'Category not found'}), 404
@@ -92,12 +91,55 @@ def delete_category(category_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Per-item (price, description, preparation_time) for each menu view
+def _takeaway_view(item):
+    return (
+        float(item.takeaway_price) if item.takeaway_price else float(item.price),
+        item.takeaway_description if item.takeaway_description else item.description,
+        item.takeaway_preparation_time if item.takeaway_preparation_time else item.preparation_time
+    )
+
+def _beach_bar_view(item):
+    # Beach waiters see beach bar prices for dine-in
+    return (
+        float(item.beach_bar_price) if item.beach_bar_price else float(item.price),
+        item.description,
+        item.preparation_time
+    )
+
+def _shop_view(item):
+    return float(item.price), item.description, item.preparation_time
+
+# Price fields each kind of user may see
+def _all_prices(item):
+    return {
+        'original_price': float(item.price),
+        'takeaway_price': float(item.takeaway_price) if item.takeaway_price else None,
+        'beach_bar_price': float(item.beach_bar_price) if item.beach_bar_price else None
+    }
+
+def _beach_bar_prices(item):
+    # No shop price for beach waiters
+    return {
+        'beach_bar_price': float(item.beach_bar_price) if item.beach_bar_price else None,
+        'takeaway_price': float(item.takeaway_price) if item.takeaway_price else None
+    }
+
+def _shop_prices(item):
+    # No beach bar price for shop waiters
+    return {
+        'original_price': float(item.price),
+        'takeaway_price': float(item.takeaway_price) if item.takeaway_price else None
+    }
+
 @menu_bp.route('/items', methods=['GET'])
 @jwt_required()
 def get_menu_items():
     try:
         current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
+        current_user = User.query.options(joinedload(User.user_location)).get(current_user_id)
+        location_name = current_user.user_location.name if current_user.user_location else None
+        is_beach_bar = location_name == 'beach_bar'
         
         category_id = request.args.get('category_id')
         search = request.args.get('search', '')
@@ -131,26 +173,30 @@ def get_menu_items():
                 )
             )
         
-        menu_items = query.order_by(MenuItem.sort_order, MenuItem.name).all()
+        menu_items = query.options(
+            undefer_group('menu_details'), joinedload(MenuItem.category)
+        ).order_by(
+            MenuItem.sort_order, MenuItem.name
+        ).all()
         items_data = []
         
+        # Pick the price/description view and visible price set once for
+        # the whole listing rather than re-branching per item
+        if order_type == 'takeaway':
+            item_view = _takeaway_view
+        elif is_beach_bar:
+            item_view = _beach_bar_view
+        else:
+            item_view = _shop_view
+        if current_user.role in ['admin', 'manager']:
+            visible_prices = _all_prices
+        elif is_beach_bar:
+            visible_prices = _beach_bar_prices
+        else:
+            visible_prices = _shop_prices
+        
         for item in menu_items:
-            # Determine pricing based on user location and order type
-            if order_type == 'takeaway':
-                # Takeaway pricing for all users
-                price = float(item.takeaway_price) if item.takeaway_price else float(item.price)
-                description = item.takeaway_description if item.takeaway_description else item.description
-                prep_time = item.takeaway_preparation_time if item.takeaway_preparation_time else item.preparation_time
-            elif current_user.user_location and current_user.user_location.name == 'beach_bar':
-                # Beach waiters see beach bar prices for dine-in
-                price = float(item.beach_bar_price) if item.beach_bar_price else float(item.price)
-                description = item.description
-                prep_time = item.preparation_time
-            else:
-                # Shop users see shop prices for dine-in
-                price = float(item.price)
-                description = item.description
-                prep_time = item.preparation_time
+            price, description, prep_time = item_view(item)
             
             # Build item data - only include prices that the user should see
             item_data = {
@@ -168,25 +214,11 @@ def get_menu_items():
                 'printer_destination': item.category.printer_destination,
                 'is_takeaway_only': item.is_takeaway_only,
                 'order_type': order_type,
-                'user_location': current_user.user_location.name if current_user.user_location else None  # For debugging
+                'user_location': location_name  # For debugging
             }
             
-            # Add pricing information based on user location and role
-            if current_user.role in ['admin', 'manager']:
-                # Admins and managers see all prices
-                item_data['original_price'] = float(item.price)
-                item_data['takeaway_price'] = float(item.takeaway_price) if item.takeaway_price else None
-                item_data['beach_bar_price'] = float(item.beach_bar_price) if item.beach_bar_price else None
-            elif current_user.user_location and current_user.user_location.name == 'beach_bar':
-                # Beach waiters only see beach bar and takeaway prices
-                item_data['beach_bar_price'] = float(item.beach_bar_price) if item.beach_bar_price else None
-                item_data['takeaway_price'] = float(item.takeaway_price) if item.takeaway_price else None
-                # Don't include shop price
-            else:
-                # Shop waiters see shop and takeaway prices
-                item_data['original_price'] = float(item.price)
-                item_data['takeaway_price'] = float(item.takeaway_price) if item.takeaway_price else None
-                # Don't include beach bar price
+            # Add only the prices this user should see
+            item_data.update(visible_prices(item))
             
             items_data.append(item_data)
         
@@ -195,27 +227,39 @@ def get_menu_items():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Columns the admin menu listing returns
+ADMIN_MENU_COLUMNS = (
+    MenuItem.id, MenuItem.name, MenuItem.barcode, MenuItem.description,
+    MenuItem.price, MenuItem.takeaway_price, MenuItem.beach_bar_price,
+    MenuItem.takeaway_description, MenuItem.category_id, MenuItem.image_url,
+    MenuItem.is_available, MenuItem.is_available_takeaway, MenuItem.is_takeaway_only,
+    MenuItem.preparation_time, MenuItem.takeaway_preparation_time,
+    MenuItem.allergens, MenuItem.nutritional_info, MenuItem.sort_order,
+    MenuItem.created_at
+)
+
 @menu_bp.route('/items/admin', methods=['GET'])
 @jwt_required()
+@require_role('admin', 'manager')
 def get_all_menu_items_admin():
     """Get all menu items for admin management - includes all fields"""
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         category_id = request.args.get('category_id')
         search = request.args.get('search', '')
         
-        query = MenuItem.query
+        # Read-only listing: select the columns straight into rows instead of
+        # hydrating MenuItem and Category instances
+        stmt = select(
+            *ADMIN_MENU_COLUMNS,
+            Category.name.label('category_name'),
+            Category.printer_destination
+        ).join(Category, MenuItem.category_id == Category.id)
         
         if category_id:
-            query = query.filter_by(category_id=category_id)
+            stmt = stmt.where(MenuItem.category_id == category_id)
         
         if search:
-            query = query.filter(
+            stmt = stmt.where(
                 or_(
                     MenuItem.name.contains(search),
                     MenuItem.description.contains(search),
@@ -223,33 +267,30 @@ def get_all_menu_items_admin():
                 )
             )
         
-        menu_items = query.order_by(MenuItem.sort_order, MenuItem.name).all()
-        items_data = []
-        
-        for item in menu_items:
-            items_data.append({
-                'id': item.id,
-                'name': item.name,
-                'barcode': item.barcode,
-                'description': item.description,
-                'price': float(item.price),
-                'takeaway_price': float(item.takeaway_price) if item.takeaway_price else None,
-                'beach_bar_price': float(item.beach_bar_price) if item.beach_bar_price else None,
-                'takeaway_description': item.takeaway_description,
-                'category_id': item.category_id,
-                'category_name': item.category.name,
-                'image_url': item.image_url,
-                'is_available': item.is_available,
-                'is_available_takeaway': item.is_available_takeaway,
-                'is_takeaway_only': item.is_takeaway_only,
-                'preparation_time': item.preparation_time,
-                'takeaway_preparation_time': item.takeaway_preparation_time,
-                'allergens': item.allergens,
-                'nutritional_info': item.nutritional_info,
-                'sort_order': item.sort_order,
-                'printer_destination': item.category.printer_destination,
-                'created_at': item.created_at.isoformat()
-            })
+        rows = db.session.execute(stmt.order_by(MenuItem.sort_order, MenuItem.name))
+        items_data = [{
+            'id': row.id,
+            'name': row.name,
+            'barcode': row.barcode,
+            'description': row.description,
+            'price': float(row.price),
+            'takeaway_price': float(row.takeaway_price) if row.takeaway_price else None,
+            'beach_bar_price': float(row.beach_bar_price) if row.beach_bar_price else None,
+            'takeaway_description': row.takeaway_description,
+            'category_id': row.category_id,
+            'category_name': row.category_name,
+            'image_url': row.image_url,
+            'is_available': row.is_available,
+            'is_available_takeaway': row.is_available_takeaway,
+            'is_takeaway_only': row.is_takeaway_only,
+            'preparation_time': row.preparation_time,
+            'takeaway_preparation_time': row.takeaway_preparation_time,
+            'allergens': row.allergens,
+            'nutritional_info': row.nutritional_info,
+            'sort_order': row.sort_order,
+            'printer_destination': row.printer_destination,
+            'created_at': row.created_at
+        } for row in rows]
         
         return jsonify({'menu_items': items_data}), 200
         
@@ -290,14 +331,9 @@ def get_item_by_barcode(barcode):
 
 @menu_bp.route('/items', methods=['POST'])
 @jwt_required()
+@require_role('admin', 'manager')
 def create_menu_item():
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         data = request.get_json()
         
         required_fields = ['name', 'price', 'category_id']
@@ -312,8 +348,7 @@ def create_menu_item():
         
         # Check if barcode is unique (if provided)
         if data.get('barcode'):
-            existing_item = MenuItem.query.filter_by(barcode=data['barcode']).first()
-            if existing_item:
+            if row_exists(MenuItem.query.filter_by(barcode=data['barcode'])):
                 return jsonify({'error': 'Barcode already exists'}), 400
         
         new_item = MenuItem(
@@ -364,14 +399,9 @@ def create_menu_item():
 
 @menu_bp.route('/items/<int:item_id>', methods=['PUT'])
 @jwt_required()
+@require_role('admin', 'manager')
 def update_menu_item(item_id):
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         item = MenuItem.query.get(item_id)
         if not item:
             return jsonify({'error': 'Menu item not found'}), 404
@@ -381,8 +411,7 @@ def update_menu_item(item_id):
         # Check if barcode is unique (if being updated)
         if 'barcode' in data and data['barcode'] != item.barcode:
             if data['barcode']:  # Only check if barcode is not empty
-                existing_item = MenuItem.query.filter_by(barcode=data['barcode']).first()
-                if existing_item:
+                if row_exists(MenuItem.query.filter_by(barcode=data['barcode'])):
                     return jsonify({'error': 'Barcode already exists'}), 400
         
         # Update fields
@@ -446,14 +475,9 @@ def update_menu_item(item_id):
 
 @menu_bp.route('/items/<int:item_id>', methods=['DELETE'])
 @jwt_required()
+@require_role('admin', 'manager')
 def delete_menu_item(item_id):
     try:
-        current_user_id = int(get_jwt_identity())
-        current_user = User.query.get(current_user_id)
-        
-        if current_user.role not in ['admin', 'manager']:
-            return jsonify({'error': 'Insufficient permissions'}), 403
-        
         item = MenuItem.query.get(item_id)
         if not item:
             return jsonify({'error': 'Menu item not found'}), 404
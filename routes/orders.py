@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_socketio import emit
-from models import Order, OrderItem, MenuItem, Table, User, Location, db
+from models import Order, OrderItem, MenuItem, Table, User, Location, db, get_system_config
 from datetime import datetime, timedelta
 from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload, selectinload
 from decimal import Decimal
 import json
 import uuid
@@ -26,7 +27,7 @@ except ImportError:
     CACHE_AVAILABLE = False
 
 try:
-    from utils import generate_order_number
+    from utils import generate_order_number, restaurant_rooms
     UTILS_AVAILABLE = True
 except ImportError:
     UTILS_AVAILABLE = False
@@ -37,6 +38,12 @@ except ImportError:
         random_suffix = str(uuid.uuid4())[:4].upper()
         return f"ORD-{timestamp}-{random_suffix}"
 
+    def restaurant_rooms(location_id):
+        """Socket.IO rooms for a location plus the admin dashboard"""
+        if location_id:
+            return [f'restaurant:{location_id}', 'restaurant:admin']
+        return ['restaurant:unassigned', 'restaurant:admin']
+
 # Initialize extensions if available
 if LIMITER_AVAILABLE:
     limiter = Limiter(key_func=get_remote_address)
@@ -58,6 +65,12 @@ else:
             return decorator
     cache = DummyCache()
 
+def update_order_totals(order, subtotal):
+    """Set an order's subtotal, total and tax, using the configured tax rate"""
+    order.subtotal = subtotal
+    order.total_amount = subtotal
+    order.tax_amount = subtotal * get_system_config('tax_rate', 0.10)
+
 def emit_socketio_event(event_name, data, room=None):
     """Helper function to safely emit socketio events"""
     try:
@@ -84,8 +97,13 @@ def get_orders():
         takeaway = request.args.get('takeaway')  # Filter for takeaway orders
         order_type = request.args.get('order_type')
         
-        # Build query
-        query = Order.query
+        # Build query, loading items, menu items, categories, waiter and
+        # table up front so rendering the list does not query per order
+        query = Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.menu_item).selectinload(MenuItem.category),
+            joinedload(Order.waiter),
+            joinedload(Order.table)
+        )
         
         # Filter by waiter for non-admin/manager users
         if current_user.role == 'waiter':
@@ -146,8 +164,8 @@ def get_orders():
                 'discount_amount': float(order.discount_amount),
                 'notes': order.notes,
                 'items': order_items,
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat()
+                'created_at': order.created_at,
+                'updated_at': order.updated_at
             }
             
             # Add table info for dine-in orders
@@ -162,7 +180,7 @@ def get_orders():
             # Add customer info for takeaway orders
             if order.order_type in ['takeaway', 'delivery']:
                 order_data['customer_name'] = order.customer_name
-                order_data['estimated_ready_time'] = order.estimated_ready_time.isoformat() if order.estimated_ready_time else None
+                order_data['estimated_ready_time'] = order.estimated_ready_time
             
             orders_data.append(order_data)
         
@@ -335,17 +353,11 @@ def create_order():
             total_amount += total_price
             print(f"  ✅ Added item to order. Running total: €{total_amount}")
         
-        # Calculate tax (assuming 10% tax rate)
-        tax_rate = 0.10
-        tax_amount = total_amount * tax_rate
-        
         # Apply discount if provided
         discount_amount = float(data.get('discount_amount', 0))
         
-        # Update order totals
-        new_order.subtotal = total_amount  # Set the subtotal first
-        new_order.total_amount = total_amount
-        new_order.tax_amount = tax_amount
+        # Update order totals, with tax at the configured rate
+        update_order_totals(new_order, total_amount)
         new_order.discount_amount = discount_amount
 
         # If the Order model has a customer_address column, set it (backwards-compatible)
@@ -362,6 +374,11 @@ def create_order():
             
         db.session.commit()
         
+        # Reload with the items (and their menu items/categories) for printing
+        new_order = Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.menu_item).selectinload(MenuItem.category)
+        ).filter_by(id=new_order.id).one()
+        
         # Virtual Environment: Simulate printer output
         print("\n" + "="*50)
         print("🖨️  VIRTUAL PRINTER SIMULATION")
@@ -471,7 +488,7 @@ def create_order():
             'table_number': table.table_number if table else None,
             'waiter_name': f"{new_order.waiter.first_name} {new_order.waiter.last_name}",
             'total_amount': float(new_order.total_amount)
-        }, room='restaurant')
+        }, room=restaurant_rooms(new_order.location_id))
         
         return jsonify({
             'message': 'Order created successfully',
@@ -498,7 +515,9 @@ def get_order(order_id):
         current_user_id = get_jwt_identity()
         current_user = User.query.get(current_user_id)
         
-        order = Order.query.get(order_id)
+        order = Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.menu_item).selectinload(MenuItem.category)
+        ).get(order_id)
         if not order:
             return jsonify({'error': 'Order not found'}), 404
         
@@ -540,8 +559,8 @@ def get_order(order_id):
             'discount_amount': float(order.discount_amount),
             'notes': order.notes,
             'items': order_items,
-            'created_at': order.created_at.isoformat(),
-            'updated_at': order.updated_at.isoformat()
+            'created_at': order.created_at,
+            'updated_at': order.updated_at
         }
         
         return jsonify({'order': order_data}), 200
@@ -585,7 +604,7 @@ def update_order_status(order_id):
             'old_status': old_status,
             'new_status': order.status,
             'table_number': order.table.table_number if order.table else None
-        }, room='restaurant')
+        }, room=restaurant_rooms(order.location_id))
         
         return jsonify({
             'message': 'Order status updated successfully',
@@ -593,7 +612,7 @@ def update_order_status(order_id):
                 'id': order.id,
                 'order_number': order.order_number,
                 'status': order.status,
-                'updated_at': order.updated_at.isoformat()
+                'updated_at': order.updated_at
             }
         }), 200
         
@@ -648,8 +667,7 @@ def add_order_item(order_id):
         db.session.add(order_item)
         
         # Update order total
-        order.total_amount += total_price
-        order.tax_amount = order.total_amount * 0.10  # Recalculate tax
+        update_order_totals(order, order.total_amount + total_price)
         order.updated_at = datetime.utcnow()
         
         db.session.commit()
@@ -693,8 +711,7 @@ def remove_order_item(order_id, item_id):
             return jsonify({'error': 'Order item not found'}), 404
         
         # Update order total
-        order.total_amount -= order_item.total_price
-        order.tax_amount = order.total_amount * 0.10  # Recalculate tax
+        update_order_totals(order, order.total_amount - order_item.total_price)
         order.updated_at = datetime.utcnow()
         
         db.session.delete(order_item)
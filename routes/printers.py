@@ -1,24 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import PrinterConfig, Order, OrderItem, User, db
+from models import Printer, Order, OrderItem, User, db
 import socket
 from datetime import datetime
 from flask import current_app
+from utils import restaurant_rooms
+from sqlalchemy.orm import selectinload
 
 def emit_socketio_event(event_name, data, room=None):
     """Helper to emit socketio events if socketio is available"""
     try:
         from app import socketio
-        # Emit to the specified room (if any) and also broadcast globally so
-        # clients that didn't join the room still receive the event.
-        try:
-            if room:
-                socketio.emit(event_name, data, room=room)
-        except Exception:
-            # proceed to global emit
-            pass
-        # global emit
-        socketio.emit(event_name, data)
+        # Emit to the specified room(s) when given, otherwise broadcast globally
+        socketio.emit(event_name, data, to=room)
     except Exception as e:
         # Don't fail printing just because socket emit failed; log and continue
         current_app.logger.debug(f"SocketIO emit failed for {event_name}: {e}")
@@ -171,7 +165,7 @@ def get_printer_configs():
         if current_user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        printers = PrinterConfig.query.filter_by(is_active=True).all()
+        printers = Printer.query.filter_by(is_active=True).all()
         printers_data = []
         
         for printer in printers:
@@ -182,7 +176,7 @@ def get_printer_configs():
                 'ip_address': printer.ip_address,
                 'port': printer.port,
                 'is_active': printer.is_active,
-                'created_at': printer.created_at.isoformat()
+                'created_at': printer.created_at
             })
         
         return jsonify({'printers': printers_data}), 200
@@ -211,7 +205,7 @@ def create_printer_config():
         if data['printer_type'] not in valid_types:
             return jsonify({'error': 'Invalid printer type'}), 400
         
-        new_printer = PrinterConfig(
+        new_printer = Printer(
             name=data['name'],
             printer_type=data['printer_type'],
             ip_address=data['ip_address'],
@@ -240,7 +234,9 @@ def create_printer_config():
 @jwt_required()
 def print_order(order_id):
     try:
-        order = Order.query.get(order_id)
+        order = Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.menu_item)
+        ).get(order_id)
         if not order:
             return jsonify({'error': 'Order not found'}), 404
         
@@ -251,9 +247,9 @@ def print_order(order_id):
         
         # Get active printers
         if printer_type == 'all':
-            printers = PrinterConfig.query.filter_by(is_active=True).all()
+            printers = Printer.query.filter_by(is_active=True).all()
         else:
-            printers = PrinterConfig.query.filter_by(
+            printers = Printer.query.filter_by(
                 printer_type=printer_type,
                 is_active=True
             ).all()
@@ -292,7 +288,7 @@ def print_order(order_id):
                             'printer_name': printer.name,
                             'printer_type': printer.printer_type,
                             'content': content
-                        }, room='restaurant')
+                        }, room=restaurant_rooms(order.location_id))
                     except Exception:
                         current_app.logger.debug('Failed to emit print_output event')
                 else:
@@ -311,7 +307,7 @@ def print_order(order_id):
                                 'printer_name': printer.name,
                                 'printer_type': printer.printer_type,
                                 'content': content
-                            }, room='restaurant')
+                            }, room=restaurant_rooms(order.location_id))
                         except Exception:
                             current_app.logger.debug('Failed to emit print_output after send')
                 
@@ -351,7 +347,7 @@ def test_printer(printer_id):
         if current_user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        printer = PrinterConfig.query.get(printer_id)
+        printer = Printer.query.get(printer_id)
         if not printer:
             return jsonify({'error': 'Printer not found'}), 404
         
@@ -393,7 +389,7 @@ def update_printer_config(printer_id):
         if current_user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        printer = PrinterConfig.query.get(printer_id)
+        printer = Printer.query.get(printer_id)
         if not printer:
             return jsonify({'error': 'Printer not found'}), 404
         
@@ -442,7 +438,7 @@ def delete_printer_config(printer_id):
         if current_user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        printer = PrinterConfig.query.get(printer_id)
+        printer = Printer.query.get(printer_id)
         if not printer:
             return jsonify({'error': 'Printer not found'}), 404
         
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Order, OrderItem, MenuItem, User, Table, SalesReport, db
 from sqlalchemy import func, and_, extract
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime, timedelta
 import calendar
 
@@ -261,7 +262,9 @@ def get_order_history():
         per_page = int(request.args.get('per_page', 50))
         
         # Build query
-        query = Order.query
+        query = Order.query.options(
+            selectinload(Order.items), joinedload(Order.table), joinedload(Order.waiter)
+        )
         
         # Permission check
         if current_user.role == 'waiter':
@@ -296,8 +299,8 @@ def get_order_history():
                 'status': order.status,
                 'total_amount': float(order.total_amount),
                 'items_count': len(order.items),
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat()
+                'created_at': order.created_at,
+                'updated_at': order.updated_at
             })
         
         return jsonify({
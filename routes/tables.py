@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Table, TableAssignment, User, Order, db
+from models import Table, TableAssignment, User, Order, db, row_exists
 from datetime import datetime
 
 tables_bp = Blueprint('tables', __name__)
@@ -63,8 +63,7 @@ def create_table():
             return jsonify({'error': 'Table capacity is required'}), 400
         
         # Check if table number already exists
-        existing_table = Table.query.filter_by(table_number=data['table_number']).first()
-        if existing_table:
+        if row_exists(Table.query.filter_by(table_number=data['table_number'])):
             return jsonify({'error': 'Table number already exists'}), 400
         
         new_table = Table(
@@ -113,8 +112,7 @@ def update_table(table_id):
         # Update fields
         if 'table_number' in data:
             # Check if new table number already exists
-            existing_table = Table.query.filter_by(table_number=data['table_number']).filter(Table.id != table_id).first()
-            if existing_table:
+            if row_exists(Table.query.filter_by(table_number=data['table_number']).filter(Table.id != table_id)):
                 return jsonify({'error': 'Table number already exists'}), 400
             table.table_number = data['table_number']
         
@@ -180,7 +178,7 @@ def get_table_assignments():
                     'name': f"{assignment.user.first_name} {assignment.user.last_name}",
                     'username': assignment.user.username
                 },
-                'assigned_at': assignment.assigned_at.isoformat()
+                'assigned_at': assignment.assigned_at
             })
         
         return jsonify({'assignments': assignments_data}), 200
@@ -237,7 +235,7 @@ def assign_table():
                 'id': new_assignment.id,
                 'table_number': table.table_number,
                 'waiter_name': f"{user.first_name} {user.last_name}",
-                'assigned_at': new_assignment.assigned_at.isoformat()
+                'assigned_at': new_assignment.assigned_at
             }
         }), 201
         
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+# The app reads its configuration at import time, so every test module shares
+# one scratch SQLite database set up before the first import of app
+_db_dir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir.name, 'test.db')}"
+
+
+def admin_headers(client):
+    """Authorization header for the default admin user"""
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
@@ -0,0 +1,53 @@
+import unittest
+
+from tests import admin_headers
+from app import app, init_db
+from models import User, db
+from utils import hash_password
+
+
+class UserListTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            init_db()
+            password_hash = hash_password('Secret#123')
+            db.session.add_all(
+                User(username=f'listed{i}', email=f'listed{i}@example.com', password_hash=password_hash,
+                     first_name='Listed', last_name=str(i), role='waiter')
+                for i in range(3)
+            )
+            db.session.commit()
+            # Rows created before created_at had a default
+            User.query.filter(User.username.in_(['listed0', 'listed1'])).update(
+                {'created_at': None}, synchronize_session=False
+            )
+            db.session.commit()
+
+        cls.client = app.test_client()
+        cls.headers = admin_headers(cls.client)
+
+    def test_pages_cover_rows_without_created_at(self):
+        response = self.client.get('/api/auth/users', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        expected = [user['username'] for user in response.get_json()['users']]
+
+        seen, cursor = [], None
+        while True:
+            query = {'role': 'waiter', 'page_size': 1}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get('/api/auth/users', headers=self.headers, query_string=query)
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            seen += [user['username'] for user in body['users']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, [name for name in expected if name.startswith('listed')])
+        self.assertEqual(sorted(seen), ['listed0', 'listed1', 'listed2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from tests import admin_headers
+from app import app, init_db
+from models import Category, Location, MenuItem, SystemConfig, Table, db, invalidate_system_config_cache
+
+
+class OrderTotalsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            init_db()
+            location = Location(name='main', display_name='Main')
+            category = Category(name='Food')
+            db.session.add_all([location, category])
+            db.session.flush()
+            menu_item = MenuItem(name='Platter', price=38, category_id=category.id)
+            table = Table(table_number='1', location_id=location.id, capacity=4)
+            db.session.add_all([menu_item, table])
+            db.session.commit()
+            cls.location_id, cls.menu_item_id, cls.table_id = location.id, menu_item.id, table.id
+
+        cls.client = app.test_client()
+        cls.headers = admin_headers(cls.client)
+
+    def test_computed_tax_is_rounded_to_cents(self):
+        # 38 * 0.10 is 3.8000000000000003 in binary floating point
+        response = self.client.post('/api/orders/', headers=self.headers, json={
+            'table_id': self.table_id,
+            'location_id': self.location_id,
+            'items': [{'menu_item_id': self.menu_item_id, 'quantity': 1}],
+        })
+        self.assertEqual(response.status_code, 201)
+        order = response.get_json()['order']
+        self.assertEqual(order['tax_amount'], 3.8)
+
+        response = self.client.get(f"/api/orders/{order['id']}", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['order']['tax_amount'], 3.8)
+
+    def test_item_changes_keep_configured_tax_rate(self):
+        with app.app_context():
+            db.session.add(SystemConfig(key='tax_rate', value='0.20', data_type='float'))
+            db.session.commit()
+            invalidate_system_config_cache()
+        try:
+            response = self.client.post('/api/orders/', headers=self.headers, json={
+                'table_id': self.table_id,
+                'location_id': self.location_id,
+                'items': [{'menu_item_id': self.menu_item_id, 'quantity': 1}],
+            })
+            order_id = response.get_json()['order']['id']
+
+            response = self.client.post(f'/api/orders/{order_id}/items', headers=self.headers,
+                                        json={'menu_item_id': self.menu_item_id, 'quantity': 1})
+            self.assertEqual(response.status_code, 201)
+            item_id = response.get_json()['order_item']['id']
+            order = self.client.get(f'/api/orders/{order_id}', headers=self.headers).get_json()['order']
+            self.assertEqual((order['total_amount'], order['tax_amount']), (76.0, 15.2))
+
+            response = self.client.delete(f'/api/orders/{order_id}/items/{item_id}', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            order = self.client.get(f'/api/orders/{order_id}', headers=self.headers).get_json()['order']
+            self.assertEqual((order['total_amount'], order['tax_amount']), (38.0, 7.6))
+        finally:
+            with app.app_context():
+                SystemConfig.query.filter_by(key='tax_rate').delete()
+                db.session.commit()
+                invalidate_system_config_cache()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,46 @@
 Utility functions for the Wireless Ordering System
 """
 
+import os
 import secrets
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache, wraps
+from flask import current_app, stream_with_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing cost. Argon2 is used for new hashes when available;
+# werkzeug's pbkdf2 hashes created before the switch keep verifying and are
+# upgraded on the next successful login. Tune these to the target verify
+# latency of the server class (roughly 50-150 ms per login).
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '19456'))  # KiB
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '1'))
+# Fallback when argon2-cffi is missing; werkzeug computes it with
+# hashlib.pbkdf2_hmac, i.e. in OpenSSL (SHA extensions where the CPU has them)
+PBKDF2_METHOD = os.getenv('PBKDF2_METHOD', 'pbkdf2:sha256:600000')
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    password_hasher = PasswordHasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST,
+        parallelism=ARGON2_PARALLELISM
+    )
+    ARGON2_AVAILABLE = True
+except ImportError:
+    ARGON2_AVAILABLE = False
+
+# Under gevent the threading module is patched into greenlets; the hub's
+# threadpool still runs real OS threads for CPU-bound work like hashing
+try:
+    from gevent import get_hub
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
 
 def generate_order_number():
     """
@@ -11,4 +49,176 @@ def generate_order_number():
     """
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     random_suffix = secrets.token_hex(2).upper()
-    return f"ORD-{timestamp}-{random_suffix}"
\ No newline at end of file
+    return f"ORD-{timestamp}-{random_suffix}"
+
+def generate_uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit millisecond timestamp
+    followed by random bits, so consecutive values sort by creation time
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | secrets.randbits(80)
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # variant
+    return uuid.UUID(int=value)
+
+def hash_password(password):
+    """
+    Hash a password with Argon2, falling back to werkzeug's pbkdf2. Under
+    gevent the hash runs on the hub's threadpool like verify_password.
+    """
+    if GEVENT_AVAILABLE:
+        return get_hub().threadpool.apply(_hash_password, (password,))
+    return _hash_password(password)
+
+def _hash_password(password):
+    if ARGON2_AVAILABLE:
+        return password_hasher.hash(password)
+    return generate_password_hash(password, method=PBKDF2_METHOD)
+
+def hash_passwords(passwords):
+    """
+    Hash a batch of passwords on native threads. The hashing libraries
+    release the GIL, so a batch uses every core.
+    """
+    if GEVENT_AVAILABLE:
+        return list(get_hub().threadpool.imap(_hash_password, passwords))
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(_hash_password, passwords))
+
+def verify_password(password_hash, password):
+    """
+    Verify a password against an Argon2 or legacy werkzeug hash. Under gevent
+    the hash runs on the hub's threadpool so other greenlets keep being served.
+    """
+    if GEVENT_AVAILABLE:
+        return get_hub().threadpool.apply(_verify_password, (password_hash, password))
+    return _verify_password(password_hash, password)
+
+def _verify_password(password_hash, password):
+    if password_hash and password_hash.startswith('$argon2'):
+        if not ARGON2_AVAILABLE:
+            return False
+        try:
+            return password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    return hash_password(secrets.token_urlsafe(16))
+
+def warm_dummy_password_hash():
+    """Build the dummy hash at startup so the first miss costs one verify"""
+    _dummy_password_hash()
+
+def verify_dummy_password(password):
+    """
+    Spend the same time as a real verification, so a login for an unknown
+    user is not distinguishable by its response time
+    """
+    verify_password(_dummy_password_hash(), password)
+    return False
+
+def password_needs_rehash(password_hash):
+    """
+    Whether a hash was made with an older algorithm or cost than the current one
+    """
+    if ARGON2_AVAILABLE:
+        if not password_hash.startswith('$argon2'):
+            return True
+        try:
+            return password_hasher.check_needs_rehash(password_hash)
+        except InvalidHashError:
+            return True
+    return not password_hash.startswith(PBKDF2_METHOD + '$')
+
+ADMIN_ROOM = 'restaurant:admin'
+UNASSIGNED_ROOM = 'restaurant:unassigned'
+
+def location_room(location_id):
+    """
+    The Socket.IO room for staff at a location; staff without a location
+    share a room of their own rather than the admin dashboard
+    """
+    return f'restaurant:{location_id}' if location_id else UNASSIGNED_ROOM
+
+def restaurant_rooms(location_id):
+    """
+    Socket.IO rooms that should hear about activity at a location:
+    that location's staff plus the global admin dashboard
+    """
+    return [location_room(location_id), ADMIN_ROOM]
+
+# Short-lived cache for rarely changing JSON list responses. Entries are Redis
+# hashes (body, ts) shared by all workers, or a per-process dict without Redis.
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+ADMIN_USERS_CACHE_KEY = 'admin:users'
+ADMIN_LOCATIONS_CACHE_KEY = 'admin:locations'
+_local_response_cache = {}
+
+def _store_cached_response(key, ttl, body):
+    redis_client = current_app.extensions.get('redis')
+    try:
+        if redis_client is not None:
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={'body': body, 'ts': time.time()})
+            pipe.expire(key, ttl)
+            pipe.execute()
+        else:
+            _local_response_cache[key] = (time.time() + ttl, body)
+    except Exception as e:
+        current_app.logger.debug(f"Response cache write failed for {key}: {e}")
+
+def _tee_into_cache(key, ttl, chunks):
+    """Pass a streamed body through, caching it once fully sent"""
+    body = []
+    for chunk in chunks:
+        body.append(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield chunk
+    _store_cached_response(key, ttl, b''.join(body))
+
+def cached_response(key, ttl=RESPONSE_CACHE_TTL):
+    """
+    Cache a view's successful JSON response under key for ttl seconds.
+    Streamed responses are cached as they are sent instead of being buffered.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            redis_client = current_app.extensions.get('redis')
+            try:
+                if redis_client is not None:
+                    body = redis_client.hget(key, 'body')
+                else:
+                    entry = _local_response_cache.get(key)
+                    body = entry[1] if entry and entry[0] > time.time() else None
+                if body is not None:
+                    return current_app.response_class(body, mimetype='application/json')
+            except Exception as e:
+                current_app.logger.debug(f"Response cache read failed for {key}: {e}")
+            
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                if response.is_streamed:
+                    response.response = stream_with_context(
+                        _tee_into_cache(key, ttl, response.response)
+                    )
+                else:
+                    _store_cached_response(key, ttl, response.get_data())
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_cached_responses(*keys):
+    """
+    Drop cached responses after the data behind them changed
+    """
+    for key in keys:
+        _local_response_cache.pop(key, None)
+    redis_client = current_app.extensions.get('redis')
+    if redis_client is not None:
+        try:
+            redis_client.delete(*keys)
+        except Exception as e:
+            current_app.logger.debug(f"Response cache invalidation failed: {e}")